@@ -1,8 +1,14 @@
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
 import torch
 from sentence_transformers import SentenceTransformer
 from langchain_google_genai import ChatGoogleGenerativeAI
+from config import (
+    EMBEDDING_MODEL_NAME, LLM_MAX_CONCURRENCY, LLM_RATE_PER_SECOND, LLM_RATE_BURST, LLM_TIMEOUT_SECONDS,
+    LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS, LLM_DEGRADED_POLICY,
+)
 
 load_dotenv()
 
@@ -10,7 +16,7 @@ load_dotenv()
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
 # Embedding model (SentenceTransformer)
-hf_client = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device=device)
+hf_client = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
 
 # LLM client (Google generative API wrapper)
 llm = ChatGoogleGenerativeAI(
@@ -19,3 +25,159 @@ llm = ChatGoogleGenerativeAI(
     temperature=0.1,
     response_mime_type="application/json",
 )
+
+
+# ---- LLM gateway: admission control in front of `llm` ----
+class LLMUnavailable(Exception):
+    """The gateway refused or gave up on an LLM call; callers fall back to their degraded policy."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline: float):
+        # Reserve a token up front (the balance may go negative: the queue of earlier
+        # reservations), then sleep outside any lock until it is due
+        self._refill()
+        wait = max(1 - self.tokens, 0) / self.rate
+        if time.monotonic() + wait > deadline:
+            raise LLMUnavailable("rate limit exceeded")
+        self.tokens -= 1
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except BaseException:
+            self.tokens += 1  # hand the reservation back
+            raise
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self):
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class LLMGateway:
+    def __init__(self, client, max_concurrency: int, rate: float, burst: int, timeout: float,
+                 failure_threshold: int, reset_seconds: float, degraded_policy: str):
+        self.client = client
+        self.timeout = timeout
+        self.degraded_policy = degraded_policy
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.stats = {"calls": 0, "succeeded": 0, "failed": 0, "timed_out": 0, "rejected": 0}
+
+    async def ainvoke(self, prompt, timeout: float = None):
+        """`llm.ainvoke` with a deadline, rate limit, concurrency cap and circuit breaker."""
+        self.stats["calls"] += 1
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise LLMUnavailable("circuit open")
+
+        # only the half-open probe gets past allow() while the breaker isn't closed
+        probe = self.breaker.state == "half_open"
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        try:
+            await self.bucket.acquire(deadline)
+            await asyncio.wait_for(self._semaphore.acquire(), max(deadline - time.monotonic(), 0))
+        except (LLMUnavailable, asyncio.TimeoutError):
+            # Local saturation: shed the call without counting it against the upstream
+            if probe:
+                self.breaker.release_probe()
+            self.stats["rejected"] += 1
+            raise LLMUnavailable("gateway saturated")
+        except BaseException:
+            # cancelled while queued: let the next call probe instead
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+        self.in_flight += 1
+        try:
+            response = await asyncio.wait_for(self.client.ainvoke(prompt), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError as e:
+            self.stats["timed_out"] += 1
+            self.breaker.record_failure()
+            raise LLMUnavailable("deadline exceeded") from e
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+        except BaseException:
+            # cancelled mid-call (request gone, worker shutting down): no verdict on the upstream
+            if probe:
+                self.breaker.release_probe()
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+        self.stats["succeeded"] += 1
+        self.breaker.record_success()
+        return response
+
+    def snapshot(self) -> dict:
+        return {
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rate_tokens": round(self.bucket.tokens, 2),
+            "degraded_policy": self.degraded_policy,
+            **self.stats,
+        }
+
+
+llm_gateway = LLMGateway(
+    llm,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    rate=LLM_RATE_PER_SECOND,
+    burst=LLM_RATE_BURST,
+    timeout=LLM_TIMEOUT_SECONDS,
+    failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD,
+    reset_seconds=LLM_BREAKER_RESET_SECONDS,
+    degraded_policy=LLM_DEGRADED_POLICY,
+)
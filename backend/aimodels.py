@@ -2,11 +2,23 @@ import os
 import json
 import re
 import csv
+import hashlib
 import numpy as np
 import os
 import asyncio
 from dotenv import load_dotenv
-from ai_clients import hf_client, llm
+from ai_clients import hf_client, llm_gateway, LLMUnavailable
+from collections import OrderedDict
+from config import (
+    LLM_DEGRADED_POLICY, COURSE_PROFILE_ENABLED, EMBEDDING_MODEL_VERSION, EMBEDDING_SEARCH_CANDIDATES, VECTOR_SEARCH_INDEX,
+    EMBEDDING_CACHE_SIZE, HYBRID_SEARCH_RRF_K, HYBRID_SEARCH_MAX_CANDIDATES,
+    STAGE_BUDGET_EMBEDDING_SECONDS, STAGE_BUDGET_MODERATION_SECONDS,
+    STAGE_BUDGET_SUBJECT_SECONDS, STAGE_BUDGET_VECTOR_SEARCH_SECONDS,
+)
+from deadline import DeadlineExceeded, within
+import moderation_model
+import course_profiles
+from catalog import course_catalog
 
 load_dotenv()
 
@@ -28,7 +40,7 @@ def rule_based_spam_score(text):
     if text.isupper() and len(text) > 5: score += 0.2
     return min(score, 1.0)
 
-async def moderate_text(text):
+async def moderate_text(text, embedding=None, deadline=None):
     spam_score = rule_based_spam_score(text)
     if spam_score > 0.6:
         return {"label":"SPAM", "confidence":spam_score, "blocked":True, "source":"rule_based"}
@@ -36,41 +48,102 @@ async def moderate_text(text):
     if contains_custom_profanity(text):
         return {"label":"HARASSMENT", "confidence":0.95, "blocked":True, "source":"custom_list"}
 
+    # Confident local verdicts skip the LLM; only the uncertain band is escalated
+    local = moderation_model.classify(embedding)
+    if local is not None:
+        return local
+
     prompt = f"""
     Classify into: SAFE, HATE_SPEECH, HARASSMENT, SPAM, SEXUAL, VIOLENCE.
     Message: "{text}"
     Return ONLY valid JSON: {{"label": "SAFE", "confidence": 0.95}}
     """
+    timeout = deadline.slice(STAGE_BUDGET_MODERATION_SECONDS) if deadline else None
     try:
-        response = await llm.ainvoke(prompt)
+        if timeout is not None and timeout <= 0:
+            raise LLMUnavailable("deadline exceeded")
+        response = await llm_gateway.ainvoke(prompt, timeout=timeout)
         parsed = json.loads(response.content)
         blocked = parsed.get("label") != "SAFE" and parsed.get("confidence", 0) > 0.6
         return {**parsed, "blocked": blocked, "source": "llm"}
     except Exception:
-        return {"label":"ERROR", "confidence":0, "blocked": False}
+        # LLM unavailable, out of budget or unparseable: the caller queues a re-check
+        if deadline:
+            deadline.degrade("moderation")
+        return degraded_moderation(embedding)
+
+def degraded_moderation(embedding=None):
+    """Verdict used while the LLM gateway is unavailable (LLM_DEGRADED_POLICY)."""
+    if LLM_DEGRADED_POLICY == "local_classifier":
+        local = moderation_model.classify(embedding, force=True)
+        if local is not None:
+            return {**local, "degraded": True}
+    # "rule_based": the spam and custom-list checks above already passed
+    return {"label":"SAFE", "confidence":0, "blocked": False, "source":"degraded_rule_based", "degraded": True}
+
+#Exact-match index
+
+def normalize_question(text: str) -> str:
+    """Word tokens only, for typeahead and fusing search results; too lossy for exact matching."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def exact_key(text: str) -> str:
+    """Lowercased, whitespace collapsed and trailing punctuation dropped; operators like + - < > ^ * are kept."""
+    text = " ".join(text.lower().split())
+    return re.sub(r"[\s?!.,;:]+$", "", text)
+
+def question_hash(text: str) -> str:
+    return hashlib.sha1(exact_key(text).encode("utf-8")).hexdigest()
 
 #Embedding & Vector Search
 
-async def get_embedding(text):
+async def get_embedding(text, deadline=None):
     try:
-        vector = await asyncio.to_thread(
+        vector = await within(deadline, STAGE_BUDGET_EMBEDDING_SECONDS, asyncio.to_thread(
             hf_client.encode, text, convert_to_numpy=True
-        )
+        ))
         return vector.tolist() if hasattr(vector, "tolist") else vector
+    except DeadlineExceeded:
+        deadline.degrade("embedding")
+        return None
     except Exception as hf_e:
         print(f"Local Embedding ERROR: {hf_e}")
         return None
-    
-async def search_atlas_vector(db, collection_name, query_embedding, filter_dict=None, limit=5):
+
+_embedding_cache = OrderedDict()
+
+async def get_embedding_cached(text):
+    """get_embedding with a small LRU keyed on the exact-match key (search-as-you-go traffic repeats a lot)."""
+    key = exact_key(text)
+    if key in _embedding_cache:
+        _embedding_cache.move_to_end(key)
+        return _embedding_cache[key]
+    vector = await get_embedding(text)
+    if vector is not None:
+        _embedding_cache[key] = vector
+        if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return vector
+
+def _vector_filter(filter_dict=None):
+    # never compare vectors from different embedding models
+    filters = {**(filter_dict or {}), "embedding_version": {"$eq": EMBEDDING_MODEL_VERSION}}
+    # tombstoned courses stay out of results until the cleanup sweep has removed their documents
+    if course_catalog.tombstoned:
+        filters = {"$and": [filters, {"course_id": {"$nin": sorted(course_catalog.tombstoned)}}]}
+    return filters
+
+async def search_atlas_vector(db, collection_name, query_embedding, filter_dict=None, limit=5, extra_fields=(), deadline=None):
     pipeline = [
         {
             "$vectorSearch": {
-                "index": "questions_vector_index",
+                "index": VECTOR_SEARCH_INDEX,
                 "path": "embedding",
                 "queryVector": query_embedding,
-                "numCandidates": 100,
+                "numCandidates": max(EMBEDDING_SEARCH_CANDIDATES, limit),
                 "limit": limit,
-                **({"filter": filter_dict} if filter_dict else {})
+                "filter": _vector_filter(filter_dict),
             }
         },
         {
@@ -80,28 +153,52 @@ async def search_atlas_vector(db, collection_name, query_embedding, filter_dict=
                 "question": 1,
                 "answer": 1,
                 "course_id": 1,
-                "frequency": 1
+                "frequency": 1,
+                **{field: 1 for field in extra_fields}
             }
         }
     ]
 
     cursor = db[collection_name].aggregate(pipeline)
-    return await cursor.to_list(length=limit)    
+    try:
+        return await within(deadline, STAGE_BUDGET_VECTOR_SEARCH_SECONDS, cursor.to_list(length=limit))
+    except DeadlineExceeded:
+        deadline.degrade("vector_search")
+        return []
 
 #Logic Required by Query Routes
 
-async def detect_subject_relevance(question: str, course_name: str):
+async def detect_subject_relevance(question: str, course_name: str, db=None, course=None, question_embedding=None, deadline=None):
     """Checks if the question pertains to the specific course subject."""
+    skipped = {"is_relevant": True, "reason": "Subject validation skipped", "degraded": True}
+    # Decide locally against the course profiles; only ambiguous margins reach the LLM
+    if COURSE_PROFILE_ENABLED and db is not None and course is not None:
+        try:
+            local = await within(deadline, STAGE_BUDGET_SUBJECT_SECONDS, course_profiles.check_relevance(db, course, question_embedding))
+        except Exception:
+            # out of budget, database error or a bad profile: same degraded path as the LLM
+            if deadline:
+                deadline.degrade("subject_validation")
+            return skipped
+        if local is not None:
+            return local
+
     prompt = f"""
     Determine if the question is relevant to the course: "{course_name}".
     Question: "{question}"
     Return ONLY valid JSON: {{"is_relevant": true, "reason": "explanation"}}
     """
+    timeout = deadline.slice(STAGE_BUDGET_SUBJECT_SECONDS) if deadline else None
     try:
-        response = await llm.ainvoke(prompt)
+        if timeout is not None and timeout <= 0:
+            raise LLMUnavailable("deadline exceeded")
+        response = await llm_gateway.ainvoke(prompt, timeout=timeout)
         return json.loads(response.content)
     except Exception:
-        return {"is_relevant": True, "reason": "Error during validation"}
+        # unavailable, out of budget or unparseable: let the question through
+        if deadline:
+            deadline.degrade("subject_validation")
+        return skipped
 
 def find_best_match(query_embedding, candidates):
     """Helper to pick the highest scoring candidate from a list."""
@@ -109,11 +206,61 @@ def find_best_match(query_embedding, candidates):
         return None
     return max(candidates, key=lambda x: x.get("similarityScore", 0))
 
-async def search_answered_questions_vector(db, query_embedding, course_id, limit=5):
+async def search_answered_questions_vector(db, query_embedding, course_id, limit=5, deadline=None):
     filters = {"course_id": {"$eq": course_id}, "answered": {"$eq": True}}
-    return await search_atlas_vector(db, "queries", query_embedding, filters, limit)
+    return await search_atlas_vector(db, "queries", query_embedding, filters, limit, deadline=deadline)
 
-async def search_faq_vector(db, query_embedding, course_id, limit=5):
+async def search_pending_questions_vector(db, query_embedding, course_id, limit=5):
+    filters = {"course_id": {"$eq": course_id}, "answered": {"$eq": False}}
+    return await search_atlas_vector(
+        db, "queries", query_embedding, filters, limit,
+        extra_fields=("course_name", "student_id", "teacher_id", "embedded_question_id", "created_at", "embedding", "embedding_version", "moderation_flagged"),
+    )
+
+async def search_faq_vector(db, query_embedding, course_id, limit=5, deadline=None):
     filters = {"course_id": {"$eq": course_id}, "answer": {"$exists": True}}
-    results = await search_atlas_vector(db, "embedded_questions", query_embedding, filters, limit)
-    return sorted(results, key=lambda x: x.get("frequency", 0), reverse=True)
\ No newline at end of file
+    results = await search_atlas_vector(db, "embedded_questions", query_embedding, filters, limit, deadline=deadline)
+    return sorted(results, key=lambda x: x.get("frequency", 0), reverse=True)
+
+#Hybrid lexical + semantic FAQ search
+
+async def search_text(db, collection_name, text, filters, limit=10):
+    cursor = db[collection_name].find(
+        {**filters, "$text": {"$search": text}},
+        {"score": {"$meta": "textScore"}, "question": 1, "answer": 1, "frequency": 1},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return await cursor.to_list(length=limit)
+
+def reciprocal_rank_fusion(ranked_lists, k=HYBRID_SEARCH_RRF_K):
+    """Fuse ranked (key, doc) lists: score = sum of 1 / (k + rank) over the lists a key appears in."""
+    scores, docs = {}, {}
+    for ranked in ranked_lists:
+        for rank, (key, doc) in enumerate(ranked, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [(docs[key], score) for key, score in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)]
+
+async def hybrid_faq_search(db, course_id, text, limit=10):
+    """FAQ entries and answered queries ranked by BM25-style text score fused with vector similarity."""
+    limit = min(limit, HYBRID_SEARCH_MAX_CANDIDATES)
+    faq_filter = {"course_id": course_id, "answer": {"$ne": None}}
+    query_filter = {"course_id": course_id, "answered": True}
+    searches = [
+        search_text(db, "embedded_questions", text, faq_filter, limit),
+        search_text(db, "queries", text, query_filter, limit),
+    ]
+    query_emb = await get_embedding_cached(text)
+    if query_emb is not None:
+        searches += [
+            search_atlas_vector(db, "embedded_questions", query_emb, {"course_id": {"$eq": course_id}, "answer": {"$ne": None}}, limit),
+            search_atlas_vector(db, "queries", query_emb, {"course_id": {"$eq": course_id}, "answered": {"$eq": True}}, limit),
+        ]
+    results = await asyncio.gather(*searches)
+
+    sources = ["faq", "query", "faq", "query"]
+    # an answered query and its FAQ entry share their text; fuse them as one result
+    ranked_lists = [
+        [(normalize_question(doc["question"]), {**doc, "source": source}) for doc in ranked]
+        for ranked, source in zip(results, sources)
+    ]
+    return reciprocal_rank_fusion(ranked_lists)
@@ -0,0 +1,113 @@
+import asyncio
+from collections import defaultdict
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from config import COURSE_CATALOG_SYNC, COURSE_CATALOG_POLL_SECONDS
+
+# In-process copy of the `courses` collection. Writes go through `add`/`remove`,
+# which update memory and bump a version document other workers poll (or watch).
+# Removed courses stay tombstoned (deleted_at set) until the cleanup sweep purges them.
+META_COLLECTION = "catalog_meta"
+VERSION_ID = "courses"
+
+
+class CourseCatalog:
+    def __init__(self):
+        self.by_id = {}
+        self.by_teacher = defaultdict(list)
+        self.tombstoned = set()
+        self.version = 0
+
+    def _index(self, courses):
+        by_id = {str(c["_id"]): c for c in courses}
+        by_teacher = defaultdict(list)
+        for c in by_id.values():
+            by_teacher[c["teacher_id"]].append(c)
+        self.by_id, self.by_teacher = by_id, by_teacher
+
+    async def _current_version(self, db):
+        meta = await db[META_COLLECTION].find_one({"_id": VERSION_ID})
+        return meta["version"] if meta else 0
+
+    async def load(self, db):
+        version = await self._current_version(db)
+        courses = await db["courses"].find().to_list(None)
+        self._index([c for c in courses if not c.get("deleted_at")])
+        self.tombstoned = {str(c["_id"]) for c in courses if c.get("deleted_at")}
+        self.version = version
+
+    async def _bump(self, db):
+        meta = await db[META_COLLECTION].find_one_and_update(
+            {"_id": VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if meta["version"] == self.version + 1:
+            self.version = meta["version"]
+        else:
+            # another worker changed the catalog in between; pick up its writes too
+            await self.load(db)
+
+    def all(self):
+        return list(self.by_id.values())
+
+    def for_teacher(self, teacher_id: str):
+        return list(self.by_teacher.get(teacher_id, []))
+
+    async def get(self, db, course_id: str):
+        course = self.by_id.get(course_id)
+        if course is None and ObjectId.is_valid(course_id):
+            # created by another worker since our last sync
+            course = await db["courses"].find_one({"_id": ObjectId(course_id), "deleted_at": {"$exists": False}})
+            if course:
+                self._index(self.all() + [course])
+        return course
+
+    async def add(self, db, course):
+        await self.add_many(db, [course])
+
+    async def add_many(self, db, courses):
+        added = {c["_id"] for c in courses}
+        self._index([c for c in self.all() if c["_id"] not in added] + list(courses))
+        await self._bump(db)
+
+    async def remove(self, db, course_ids):
+        removed = {str(cid) for cid in course_ids}
+        self._index([c for c in self.all() if str(c["_id"]) not in removed])
+        self.tombstoned |= removed
+        await self._bump(db)
+
+    async def purged(self, db, course_ids):
+        self.tombstoned -= {str(cid) for cid in course_ids}
+        await self._bump(db)
+
+    async def _poll(self, db):
+        while True:
+            await asyncio.sleep(COURSE_CATALOG_POLL_SECONDS)
+            try:
+                if await self._current_version(db) != self.version:
+                    await self.load(db)
+            except PyMongoError as e:
+                print(f"Course catalog poll failed: {e}")
+
+    async def _watch(self, db):
+        try:
+            async with db["courses"].watch() as stream:
+                async for _ in stream:
+                    await self.load(db)
+        except PyMongoError as e:
+            print(f"Course catalog change stream unavailable ({e}), falling back to polling")
+            await self._poll(db)
+
+    def start_sync(self, db):
+        """Background task keeping this worker in step with writes made by other workers."""
+        if COURSE_CATALOG_SYNC == "change_stream":
+            return asyncio.create_task(self._watch(db))
+        if COURSE_CATALOG_SYNC == "poll":
+            return asyncio.create_task(self._poll(db))
+        return None
+
+
+course_catalog = CourseCatalog()
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from catalog import course_catalog
+from counters import STUDENT_COUNTERS, COURSE_COUNTERS
+from course_profiles import PROFILES_COLLECTION
+import notifications
+from notifications import NOTIFICATIONS, UNREAD_COUNTERS
+from config import CLEANUP_BATCH_SIZE, CLEANUP_THROTTLE_SECONDS, CLEANUP_POLL_SECONDS, CLEANUP_STALE_SECONDS
+
+# Cascade cleanup: deletes tombstone the course/teacher and enqueue a job here;
+# a background worker removes the dependent documents in bounded, throttled batches.
+JOBS_COLLECTION = "cleanup_jobs"
+
+
+async def enqueue(db, kind: str, target_id: str, course_ids):
+    await db[JOBS_COLLECTION].insert_one({
+        "kind": kind,                       # "course" or "teacher"
+        "target_id": target_id,
+        "course_ids": [str(cid) for cid in course_ids],
+        "status": "pending",
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+async def _delete_in_batches(db, collection_name, filters):
+    deleted = 0
+    while True:
+        ids = [d["_id"] for d in await db[collection_name].find(filters, {"_id": 1}).limit(CLEANUP_BATCH_SIZE).to_list(CLEANUP_BATCH_SIZE)]
+        if not ids:
+            return deleted
+        if collection_name == NOTIFICATIONS:
+            # keeps the unread counters exact batch by batch
+            deleted += await notifications.delete_matching(db, {"_id": {"$in": ids}})
+        else:
+            deleted += (await db[collection_name].delete_many({"_id": {"$in": ids}})).deleted_count
+        await asyncio.sleep(CLEANUP_THROTTLE_SECONDS)
+
+
+async def _delete_queries(db, filters):
+    """Queries go last, batch by batch, after the ratings and notifications that point at them."""
+    deleted = 0
+    while True:
+        ids = [d["_id"] for d in await db["queries"].find(filters, {"_id": 1}).limit(CLEANUP_BATCH_SIZE).to_list(CLEANUP_BATCH_SIZE)]
+        if not ids:
+            return deleted
+        str_ids = [str(i) for i in ids]
+        await db["ratings"].delete_many({"query_id": {"$in": str_ids}})
+        await notifications.delete_matching(db, {"query_id": {"$in": str_ids}})
+        deleted += (await db["queries"].delete_many({"_id": {"$in": ids}})).deleted_count
+        await asyncio.sleep(CLEANUP_THROTTLE_SECONDS)
+
+
+async def run_job(db, job):
+    course_ids = job["course_ids"]
+    counts = {}
+    if course_ids:
+        counts["queries"] = await _delete_queries(db, {"course_id": {"$in": course_ids}})
+        counts["embedded_questions"] = await _delete_in_batches(db, "embedded_questions", {"course_id": {"$in": course_ids}})
+        counts["notifications"] = await _delete_in_batches(db, NOTIFICATIONS, {"course_id": {"$in": course_ids}})
+        await db[STUDENT_COUNTERS].delete_many({"course_id": {"$in": course_ids}})
+        await db[COURSE_COUNTERS].delete_many({"course_id": {"$in": course_ids}})
+        await db[PROFILES_COLLECTION].delete_many({"course_id": {"$in": course_ids}})
+    if job["kind"] == "teacher":
+        counts["ratings"] = await _delete_in_batches(db, "ratings", {"teacher_id": job["target_id"]})
+        counts["notifications"] = counts.get("notifications", 0) + await _delete_in_batches(
+            db, NOTIFICATIONS, {"user_id": job["target_id"]}
+        )
+        await db[UNREAD_COUNTERS].delete_one({"_id": job["target_id"]})
+
+    await db["courses"].delete_many({"_id": {"$in": [ObjectId(cid) for cid in course_ids]}, "deleted_at": {"$exists": True}})
+    await course_catalog.purged(db, course_ids)
+    return counts
+
+
+async def _claim(db):
+    stale = datetime.now(timezone.utc) - timedelta(seconds=CLEANUP_STALE_SECONDS)
+    return await db[JOBS_COLLECTION].find_one_and_update(
+        {"$or": [{"status": "pending"}, {"status": "running", "claimed_at": {"$lt": stale}}]},
+        {"$set": {"status": "running", "claimed_at": datetime.now(timezone.utc)}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_cleanup_worker(db):
+    """Background loop started from the app lifespan; safe to run in several workers."""
+    while True:
+        try:
+            job = await _claim(db)
+            if job is None:
+                await asyncio.sleep(CLEANUP_POLL_SECONDS)
+                continue
+            counts = await run_job(db, job)
+            await db[JOBS_COLLECTION].update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc), "deleted": counts}},
+            )
+        except PyMongoError as e:
+            print(f"Cleanup worker error: {e}")
+            await asyncio.sleep(CLEANUP_POLL_SECONDS)
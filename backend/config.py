@@ -4,11 +4,100 @@ import os
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "Codeyatra")
+# Mongo client pool, timeouts and wire compression
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", 2))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,zlib")
+MONGO_READ_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_READ_MAX_STALENESS_SECONDS", -1))  # -1: no limit, else >= 90
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
+# Embedding model configuration; the version tag is stored with every embedding
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL_VERSION = os.getenv("EMBEDDING_MODEL_VERSION", "all-MiniLM-L6-v2")
 # Embedding search configuration
 EMBEDDING_SIMILARITY_THRESHOLD = float(os.getenv("EMBEDDING_SIMILARITY_THRESHOLD", 0.82))
-EMBEDDING_SEARCH_CANDIDATES = int(os.getenv("EMBEDDING_SEARCH_CANDIDATES", 50))
+VECTOR_SEARCH_INDEX = os.getenv("VECTOR_SEARCH_INDEX", "questions_vector_index")  # a new index when the model's dimension changes
+EMBEDDING_SEARCH_CANDIDATES = int(os.getenv("EMBEDDING_SEARCH_CANDIDATES", 100))  # $vectorSearch numCandidates, see scripts/eval_retrieval.py
 # Subject validation configuration
 SUBJECT_VALIDATION_ENABLED = os.getenv("SUBJECT_VALIDATION_ENABLED", "true").lower() == "true"
 SUBJECT_VALIDATION_CONFIDENCE_THRESHOLD = float(os.getenv("SUBJECT_VALIDATION_CONFIDENCE_THRESHOLD", 0.6))
+# Answer propagation configuration
+ANSWER_PROPAGATION_ENABLED = os.getenv("ANSWER_PROPAGATION_ENABLED", "true").lower() == "true"
+ANSWER_PROPAGATION_THRESHOLD = float(os.getenv("ANSWER_PROPAGATION_THRESHOLD", 0.9))
+ANSWER_PROPAGATION_LIMIT = int(os.getenv("ANSWER_PROPAGATION_LIMIT", 20))
+# Bulk answer configuration
+BULK_ANSWER_MAX_ITEMS = int(os.getenv("BULK_ANSWER_MAX_ITEMS", 500))
+# LLM gateway configuration
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", 5))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", 10))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 8))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+LLM_DEGRADED_POLICY = os.getenv("LLM_DEGRADED_POLICY", "rule_based")  # "rule_based" or "local_classifier"
+# Local moderation classifier configuration
+MODERATION_MODEL_DIR = os.getenv("MODERATION_MODEL_DIR", "artifacts/moderation")
+MODERATION_MODEL_VERSION = os.getenv("MODERATION_MODEL_VERSION")  # pin a version, default is latest
+MODERATION_LOCAL_SAFE_THRESHOLD = float(os.getenv("MODERATION_LOCAL_SAFE_THRESHOLD", 0.97))
+MODERATION_LOCAL_UNSAFE_THRESHOLD = float(os.getenv("MODERATION_LOCAL_UNSAFE_THRESHOLD", 0.9))
+# Course profile (local subject relevance) configuration
+COURSE_PROFILE_ENABLED = os.getenv("COURSE_PROFILE_ENABLED", "true").lower() == "true"
+COURSE_PROFILE_ACCEPT_SIMILARITY = float(os.getenv("COURSE_PROFILE_ACCEPT_SIMILARITY", 0.45))
+COURSE_PROFILE_REJECT_SIMILARITY = float(os.getenv("COURSE_PROFILE_REJECT_SIMILARITY", 0.2))
+COURSE_PROFILE_SIBLING_MARGIN = float(os.getenv("COURSE_PROFILE_SIBLING_MARGIN", 0.1))
+COURSE_PROFILE_SEED_LIMIT = int(os.getenv("COURSE_PROFILE_SEED_LIMIT", 500))
+COURSE_PROFILE_REFRESH_SECONDS = float(os.getenv("COURSE_PROFILE_REFRESH_SECONDS", 300))
+# Course catalog cache configuration
+COURSE_CATALOG_SYNC = os.getenv("COURSE_CATALOG_SYNC", "poll")  # "none", "poll" or "change_stream"
+COURSE_CATALOG_POLL_SECONDS = float(os.getenv("COURSE_CATALOG_POLL_SECONDS", 5))
+# Notification lifecycle configuration
+NOTIFICATION_READ_TTL_SECONDS = int(os.getenv("NOTIFICATION_READ_TTL_SECONDS", 30 * 24 * 3600))
+# Admin export configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", 64 * 1024))
+# Admin bulk import configuration
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 500))
+# Cascade cleanup configuration
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", 500))
+CLEANUP_THROTTLE_SECONDS = float(os.getenv("CLEANUP_THROTTLE_SECONDS", 0.2))
+CLEANUP_POLL_SECONDS = float(os.getenv("CLEANUP_POLL_SECONDS", 10))
+CLEANUP_STALE_SECONDS = float(os.getenv("CLEANUP_STALE_SECONDS", 600))
+# Hybrid FAQ search configuration
+HYBRID_SEARCH_RRF_K = int(os.getenv("HYBRID_SEARCH_RRF_K", 60))
+HYBRID_SEARCH_MAX_CANDIDATES = int(os.getenv("HYBRID_SEARCH_MAX_CANDIDATES", 100))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 1024))
+# Typeahead suggestion configuration
+TYPEAHEAD_MAX_RESULTS = int(os.getenv("TYPEAHEAD_MAX_RESULTS", 8))
+TYPEAHEAD_MAX_QUESTION_CHARS = int(os.getenv("TYPEAHEAD_MAX_QUESTION_CHARS", 160))
+TYPEAHEAD_MAX_ENTRIES_PER_COURSE = int(os.getenv("TYPEAHEAD_MAX_ENTRIES_PER_COURSE", 5000))
+TYPEAHEAD_REFRESH_SECONDS = float(os.getenv("TYPEAHEAD_REFRESH_SECONDS", 300))
+# Idempotency configuration
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_STALE_SECONDS = float(os.getenv("IDEMPOTENCY_STALE_SECONDS", 120))  # unfinished claims older than this can be taken over
+# create_query deadline budget (seconds); each stage gets at most its slice of what is left
+CREATE_QUERY_DEADLINE_SECONDS = float(os.getenv("CREATE_QUERY_DEADLINE_SECONDS", 10))
+CREATE_QUERY_WRITE_RESERVE_SECONDS = float(os.getenv("CREATE_QUERY_WRITE_RESERVE_SECONDS", 1))
+STAGE_BUDGET_EMBEDDING_SECONDS = float(os.getenv("STAGE_BUDGET_EMBEDDING_SECONDS", 2))
+STAGE_BUDGET_MODERATION_SECONDS = float(os.getenv("STAGE_BUDGET_MODERATION_SECONDS", 4))
+STAGE_BUDGET_SUBJECT_SECONDS = float(os.getenv("STAGE_BUDGET_SUBJECT_SECONDS", 3))
+STAGE_BUDGET_VECTOR_SEARCH_SECONDS = float(os.getenv("STAGE_BUDGET_VECTOR_SEARCH_SECONDS", 1.5))
+# Asynchronous moderation of questions whose moderation stage was degraded
+MODERATION_QUEUE_POLL_SECONDS = float(os.getenv("MODERATION_QUEUE_POLL_SECONDS", 5))
+MODERATION_QUEUE_RETRY_SECONDS = float(os.getenv("MODERATION_QUEUE_RETRY_SECONDS", 60))
+MODERATION_QUEUE_MAX_ATTEMPTS = int(os.getenv("MODERATION_QUEUE_MAX_ATTEMPTS", 48))
+MODERATION_QUEUE_STALE_SECONDS = float(os.getenv("MODERATION_QUEUE_STALE_SECONDS", 120))  # a running job older than this is reclaimed
+# Teacher answer drafts generated in the background from nearby FAQ answers
+DRAFTS_ENABLED = os.getenv("DRAFTS_ENABLED", "true").lower() == "true"
+DRAFT_BATCH_SIZE = int(os.getenv("DRAFT_BATCH_SIZE", 8))  # queries per LLM call
+DRAFT_FAQ_NEIGHBOURS = int(os.getenv("DRAFT_FAQ_NEIGHBOURS", 3))
+DRAFT_MIN_SIMILARITY = float(os.getenv("DRAFT_MIN_SIMILARITY", 0.75))
+DRAFT_LLM_TIMEOUT_SECONDS = float(os.getenv("DRAFT_LLM_TIMEOUT_SECONDS", 30))
+DRAFT_POLL_SECONDS = float(os.getenv("DRAFT_POLL_SECONDS", 10))
+DRAFT_RETRY_SECONDS = float(os.getenv("DRAFT_RETRY_SECONDS", 60))
+DRAFT_STALE_SECONDS = float(os.getenv("DRAFT_STALE_SECONDS", 300))  # a running claim older than this is reclaimed
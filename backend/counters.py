@@ -0,0 +1,152 @@
+from collections import Counter
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Materialized query counters, kept in step with `queries` by create/answer
+STUDENT_COUNTERS = "course_student_counters"   # one per (course, student)
+COURSE_COUNTERS = "course_counters"             # one per course
+
+
+async def record_query_created(db, query):
+    now = query["created_at"]
+    student = await db[STUDENT_COUNTERS].update_one(
+        {"course_id": query["course_id"], "student_id": query["student_id"]},
+        {
+            "$inc": {"total": 1, "pending": 1},
+            "$min": {"first_activity": now},
+            "$max": {"last_activity": now},
+            "$set": {"teacher_id": query["teacher_id"]},
+        },
+        upsert=True,
+    )
+    await db[COURSE_COUNTERS].update_one(
+        {"course_id": query["course_id"]},
+        {
+            "$inc": {"total": 1, "pending": 1, "students": 1 if student.upserted_id else 0},
+            "$max": {"last_activity": now},
+            "$set": {"teacher_id": query["teacher_id"], "course_name": query["course_name"]},
+        },
+        upsert=True,
+    )
+
+
+async def record_queries_answered(db, queries, now):
+    """Decrement pending counts; `queries` must be exactly the ones this write moved from pending to answered."""
+    await _decrement_pending(db, queries, now)
+
+
+async def record_queries_flagged(db, queries, now):
+    """Moderation-flagged queries leave the teacher's queue, so they stop counting as pending."""
+    await _decrement_pending(db, queries, now)
+
+
+async def _decrement_pending(db, queries, now):
+    per_student = Counter((q["course_id"], q["student_id"]) for q in queries)
+    if not per_student:
+        return
+    per_course = Counter()
+    for (course_id, _), n in per_student.items():
+        per_course[course_id] += n
+
+    await db[STUDENT_COUNTERS].bulk_write([
+        UpdateOne(
+            {"course_id": course_id, "student_id": student_id},
+            {"$inc": {"pending": -n}, "$max": {"last_activity": now}},
+        )
+        for (course_id, student_id), n in per_student.items()
+    ], ordered=False)
+    await db[COURSE_COUNTERS].bulk_write([
+        UpdateOne({"course_id": course_id}, {"$inc": {"pending": -n}, "$max": {"last_activity": now}})
+        for course_id, n in per_course.items()
+    ], ordered=False)
+
+
+async def ensure_course_counters(db, course_ids):
+    """Rebuild the counters of courses never rebuilt since the counters were deployed.
+
+    Increments alone can't be trusted until then: the first query after deploy creates
+    a counter document that knows nothing about the course's older queries.
+    """
+    rebuilt = set(await db[COURSE_COUNTERS].distinct(
+        "course_id", {"course_id": {"$in": list(course_ids)}, "rebuilt_at": {"$exists": True}}
+    ))
+    for course_id in course_ids:
+        if course_id not in rebuilt:
+            await rebuild_course_counters(db, course_id)
+
+
+async def rebuild_course_counters(db, course_id: str):
+    """Recompute a course's counters from `queries` with a server-side aggregation."""
+    await db["queries"].aggregate([
+        {"$match": {"course_id": course_id}},
+        {"$group": {
+            "_id": "$student_id",
+            "teacher_id": {"$last": "$teacher_id"},
+            "total": {"$sum": 1},
+            # flagged queries are hidden from the teacher's queue (see record_queries_flagged)
+            "pending": {"$sum": {"$cond": [{"$or": ["$answered", {"$eq": ["$moderation_flagged", True]}]}, 0, 1]}},
+            "first_activity": {"$min": "$created_at"},
+            "last_activity": {"$max": {"$max": ["$created_at", "$answered_at"]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "course_id": {"$literal": course_id},
+            "student_id": "$_id",
+            "teacher_id": 1,
+            "total": 1,
+            "pending": 1,
+            "first_activity": 1,
+            "last_activity": 1,
+        }},
+        {"$merge": {
+            "into": STUDENT_COUNTERS,
+            "on": ["course_id", "student_id"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]).to_list(None)
+
+    course = await db["courses"].find_one({"_id": ObjectId(course_id)}) if ObjectId.is_valid(course_id) else None
+    await db[STUDENT_COUNTERS].aggregate([
+        {"$match": {"course_id": course_id}},
+        {"$group": {
+            "_id": "$course_id",
+            "teacher_id": {"$last": "$teacher_id"},
+            "total": {"$sum": "$total"},
+            "pending": {"$sum": "$pending"},
+            "students": {"$sum": 1},
+            "last_activity": {"$max": "$last_activity"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "course_id": "$_id",
+            "course_name": {"$literal": course["name"] if course else ""},
+            "teacher_id": 1,
+            "total": 1,
+            "pending": 1,
+            "students": 1,
+            "last_activity": 1,
+            "rebuilt_at": "$$NOW",
+        }},
+        {"$merge": {
+            "into": COURSE_COUNTERS,
+            "on": "course_id",
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]).to_list(None)
+    # a course without queries gets no document from the $merge; leave a zero-count marker
+    # (no teacher_id, so it stays off the dashboard until its first query sets one)
+    await db[COURSE_COUNTERS].update_one(
+        {"course_id": course_id},
+        {"$setOnInsert": {
+            "course_name": course["name"] if course else "",
+            "total": 0,
+            "pending": 0,
+            "students": 0,
+            "rebuilt_at": datetime.now(timezone.utc),
+        }},
+        upsert=True,
+    )
+
@@ -0,0 +1,110 @@
+import time
+import asyncio
+import numpy as np
+from collections import defaultdict
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from ai_clients import hf_client
+from config import (
+    EMBEDDING_MODEL_VERSION, COURSE_PROFILE_ACCEPT_SIMILARITY, COURSE_PROFILE_REJECT_SIMILARITY, COURSE_PROFILE_SIBLING_MARGIN,
+    COURSE_PROFILE_SEED_LIMIT, COURSE_PROFILE_REFRESH_SECONDS,
+)
+
+# Per-course profile embedding: centroid of the course name and its answered questions.
+# Stored as a running sum + count so answers can be folded in with a single $inc.
+PROFILES_COLLECTION = "course_profiles"
+
+_centroids = {}      # course_id -> unit-length centroid
+_loaded_at = 0.0
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _cache(profile, centroids=None):
+    if profile.get("embedding_version") == EMBEDDING_MODEL_VERSION and profile.get("count"):
+        (_centroids if centroids is None else centroids)[profile["course_id"]] = _unit(profile["sum"])
+
+
+async def load_profiles(db):
+    global _centroids, _loaded_at
+    centroids = {}
+    async for profile in db[PROFILES_COLLECTION].find({"embedding_version": EMBEDDING_MODEL_VERSION}):
+        _cache(profile, centroids)
+    _centroids, _loaded_at = centroids, time.monotonic()
+
+
+async def ensure_profile(db, course):
+    """Seed a course's profile from its name and already-answered questions."""
+    course_id = str(course["_id"])
+    if course_id in _centroids:
+        return
+    name_emb = await asyncio.to_thread(hf_client.encode, course["name"], convert_to_numpy=True)
+    vectors = [name_emb]
+    answered = db["queries"].find(
+        {"course_id": course_id, "answered": True, "embedding": {"$ne": None}, "embedding_version": EMBEDDING_MODEL_VERSION},
+        {"embedding": 1},
+    ).limit(COURSE_PROFILE_SEED_LIMIT)
+    async for q in answered:
+        vectors.append(q["embedding"])
+    profile = {
+        "course_id": course_id,
+        "name": course["name"],
+        "embedding_version": EMBEDDING_MODEL_VERSION,
+        "sum": np.sum(np.asarray(vectors, dtype=np.float32), axis=0).tolist(),
+        "count": len(vectors),
+        "updated_at": datetime.now(timezone.utc),
+    }
+    await db[PROFILES_COLLECTION].replace_one({"course_id": course_id}, profile, upsert=True)
+    _cache(profile)
+
+
+async def add_answered(db, queries):
+    """Fold newly answered questions into their course profiles."""
+    by_course = defaultdict(list)
+    for q in queries:
+        # embeddings from another model live in a different vector space (or dimension)
+        if q.get("embedding") is None or q.get("embedding_version") != EMBEDDING_MODEL_VERSION:
+            continue
+        if not q.get("answered", False):
+            by_course[q["course_id"]].append(q["embedding"])
+    for course_id, vectors in by_course.items():
+        delta = np.sum(np.asarray(vectors, dtype=np.float32), axis=0)
+        profile = await db[PROFILES_COLLECTION].find_one_and_update(
+            {"course_id": course_id, "embedding_version": EMBEDDING_MODEL_VERSION},
+            {
+                "$inc": {"count": len(vectors), **{f"sum.{i}": float(v) for i, v in enumerate(delta)}},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        # No profile yet: it is seeded (including these answers) on the next relevance check
+        if profile:
+            _cache(profile)
+
+
+async def check_relevance(db, course, question_embedding):
+    """Local relevance verdict, or None when the margin is ambiguous and the LLM should decide."""
+    if question_embedding is None:
+        return None
+    if time.monotonic() - _loaded_at > COURSE_PROFILE_REFRESH_SECONDS:
+        await load_profiles(db)
+    await ensure_profile(db, course)
+
+    course_id = str(course["_id"])
+    centroids = _centroids
+    if course_id not in centroids:
+        return None
+    question = _unit(question_embedding)
+    own = float(question @ centroids[course_id])
+    siblings = [(float(question @ c), cid) for cid, c in centroids.items() if cid != course_id]
+    best_sibling, _ = max(siblings, default=(-1.0, None))
+
+    if own >= COURSE_PROFILE_ACCEPT_SIMILARITY:
+        return {"is_relevant": True, "reason": "Matches the course profile", "similarity": own, "source": "course_profile"}
+    if own <= COURSE_PROFILE_REJECT_SIMILARITY and best_sibling - own >= COURSE_PROFILE_SIBLING_MARGIN:
+        return {"is_relevant": False, "reason": "Closer to another course", "similarity": own, "source": "course_profile"}
+    return None
@@ -1,9 +1,135 @@
+import time
+import threading
 from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGO_URI
+from pymongo import WriteConcern, monitoring
+from pymongo.read_preferences import SecondaryPreferred
+import metrics
+from config import (
+    MONGO_URI, MONGO_DB_NAME, NOTIFICATION_READ_TTL_SECONDS, IDEMPOTENCY_TTL_SECONDS,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_CONNECTING, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_COMPRESSORS, MONGO_READ_MAX_STALENESS_SECONDS,
+)
 
-client = AsyncIOMotorClient(MONGO_URI)
+# Lag-tolerant list reads (FAQ and history) may be served by secondaries
+SECONDARY_READS = SecondaryPreferred(max_staleness=MONGO_READ_MAX_STALENESS_SECONDS)
+# Notifications are cheap to lose and rebuildable, so their writes skip the journal wait
+RELAXED_WRITES = WriteConcern(w=1, j=False)
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Records how long operations wait to check a connection out of the pool."""
+
+    _local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        # newer drivers report the wait themselves; otherwise time it on the checking-out thread
+        started = getattr(self._local, "started", None)
+        duration = getattr(event, "duration", None)
+        if duration is None and started is not None:
+            duration = time.perf_counter() - started
+        if duration is not None:
+            metrics.observe("mongo.pool.checkout_wait_ms", duration * 1000)
+        self._local.started = None
+
+    def connection_check_out_failed(self, event):
+        metrics.incr(f"mongo.pool.checkout_failed.{event.reason}")
+        self._local.started = None
+
+    def connection_created(self, event):
+        metrics.incr("mongo.pool.connections_created")
+
+    def connection_closed(self, event):
+        metrics.incr("mongo.pool.connections_closed")
+
+    def pool_cleared(self, event):
+        metrics.incr("mongo.pool.cleared")
+
+    # the base class requires every event handler
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+client = None
+db = None
+
+
+def connect():
+    """Create the client (once); the app lifespan calls this, scripts get it lazily."""
+    global client, db
+    if client is None:
+        client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxConnecting=MONGO_MAX_CONNECTING,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            compressors=MONGO_COMPRESSORS,
+            event_listeners=[PoolWaitListener()],
+        )
+        db = client[MONGO_DB_NAME]
+    return db
+
+
+def close():
+    global client, db
+    if client is not None:
+        client.close()
+        client = db = None
 
-db = client["Codeyatra"]
 
 def get_database():
-    return db
\ No newline at end of file
+    return db if db is not None else connect()
+
+
+def get_secondary_database():
+    """Database handle for FAQ and history lists; reads go to a secondary when one is available."""
+    return get_database().with_options(read_preference=SECONDARY_READS)
+
+
+def relaxed_collection(database, name):
+    return database.get_collection(name, write_concern=RELAXED_WRITES)
+
+
+async def ensure_indexes():
+    db = get_database()
+    await db["queries"].create_index([("course_id", 1), ("student_id", 1)])
+    await db["course_student_counters"].create_index([("course_id", 1), ("student_id", 1)], unique=True)
+    await db["course_student_counters"].create_index([("course_id", 1), ("teacher_id", 1), ("first_activity", 1)])
+    await db["course_counters"].create_index("course_id", unique=True)
+    await db["course_counters"].create_index("teacher_id")
+    await db["moderation_verdicts"].create_index("embedding_version")
+    await db["course_profiles"].create_index("course_id", unique=True)
+    await db["embedded_questions"].create_index([("course_id", 1), ("question_hash", 1)])
+    await db["queries"].create_index([("course_id", 1), ("question_hash", 1), ("answered", 1)])
+    await db["courses"].create_index("teacher_id")
+    await db["notifications"].create_index([("user_id", 1), ("created_at", -1)])
+    await db["notifications"].create_index([("user_id", 1), ("query_id", 1)])
+    await db["notifications"].create_index("read_at", expireAfterSeconds=NOTIFICATION_READ_TTL_SECONDS)
+    await db["cleanup_jobs"].create_index([("status", 1), ("created_at", 1)])
+    await db["moderation_queue"].create_index([("status", 1), ("not_before", 1)])
+    await db["queries"].create_index([("draft_status", 1), ("created_at", 1)])
+    await db["ratings"].create_index("query_id")
+    await db["ratings"].create_index("teacher_id")
+    await db["embedded_questions"].create_index([("question", "text")])
+    await db["queries"].create_index([("question", "text")])
+    await db["embedded_questions"].create_index([("course_id", 1), ("frequency", -1)])
+    await db["idempotency_keys"].create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
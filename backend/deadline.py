@@ -0,0 +1,42 @@
+import time
+import asyncio
+import metrics
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """Overall time budget for one request; each stage gets a bounded slice of what is left."""
+
+    def __init__(self, seconds: float, reserve: float = 0.0):
+        self.expires_at = time.monotonic() + seconds
+        self.reserve = reserve  # kept back for the writes after the last stage
+        self.degraded = []
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def slice(self, budget: float) -> float:
+        return max(min(budget, self.remaining() - self.reserve), 0.0)
+
+    def degrade(self, stage: str):
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+            metrics.incr(f"degraded.{stage}")
+
+
+async def within(deadline, budget: float, awaitable):
+    """Await `awaitable` inside its slice of `deadline` (no limit without one)."""
+    if deadline is None:
+        return await awaitable
+    timeout = deadline.slice(budget)
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded() from e
@@ -0,0 +1,130 @@
+import json
+import uuid
+import asyncio
+from datetime import datetime, timezone, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+import metrics
+from ai_clients import llm_gateway, LLMUnavailable
+from aimodels import search_faq_vector
+from config import (
+    DRAFT_BATCH_SIZE, DRAFT_FAQ_NEIGHBOURS, DRAFT_MIN_SIMILARITY, DRAFT_LLM_TIMEOUT_SECONDS,
+    DRAFT_POLL_SECONDS, DRAFT_RETRY_SECONDS, DRAFT_STALE_SECONDS,
+)
+
+# Suggested answers for pending queries, written from the nearest answered FAQ entries.
+# create_query marks new queries draft_status="pending"; the worker drafts them in batches,
+# one LLM call per batch, and teachers confirm (or edit) the draft when answering.
+
+
+async def _claim_batch(db):
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=DRAFT_STALE_SECONDS)
+    claimable = {"answered": False, "moderation_flagged": {"$ne": True}, "$or": [
+        {"draft_status": "pending", "draft_not_before": {"$not": {"$gt": now}}},
+        {"draft_status": "running", "draft_claimed_at": {"$lt": stale}},
+    ]}
+    candidates = await db["queries"].find(claimable, {"_id": 1}).sort("created_at", 1).limit(DRAFT_BATCH_SIZE).to_list(DRAFT_BATCH_SIZE)
+    if not candidates:
+        return []
+    token = uuid.uuid4().hex
+    ids = [c["_id"] for c in candidates]
+    # same conditions again, so a batch another worker just claimed isn't taken over
+    await db["queries"].update_many(
+        {**claimable, "_id": {"$in": ids}},
+        {"$set": {"draft_status": "running", "draft_claim": token, "draft_claimed_at": now}},
+    )
+    return await db["queries"].find(
+        {"_id": {"$in": ids}, "draft_claim": token, "draft_status": "running"},
+        {"question": 1, "course_id": 1, "course_name": 1, "embedding": 1},
+    ).to_list(DRAFT_BATCH_SIZE)
+
+
+async def _neighbours(db, q):
+    if q.get("embedding") is None:
+        return []
+    faqs = await search_faq_vector(db, q["embedding"], q["course_id"], limit=DRAFT_FAQ_NEIGHBOURS)
+    return [f for f in faqs if f.get("answer") and f.get("similarityScore", 0) >= DRAFT_MIN_SIMILARITY]
+
+
+def _prompt(items):
+    blocks = []
+    for q, faqs in items:
+        references = "\n".join(f'    - Q: "{f["question"]}"\n      A: "{f["answer"]}"' for f in faqs)
+        blocks.append(f'  id: {q["_id"]}\n  course: {q.get("course_name", "")}\n  question: "{q["question"]}"\n  answered FAQ:\n{references}')
+    return f"""
+    You draft answers for a teacher to review. For each question below, write a short answer
+    using only the answered FAQ entries listed with it. If they do not answer it, return an empty draft.
+    {chr(10).join(blocks)}
+    Return ONLY valid JSON: {{"drafts": [{{"id": "<id>", "draft": "answer text"}}]}}
+    """
+
+
+def _parse_drafts(content):
+    try:
+        return {str(d["id"]): (d.get("draft") or "").strip() for d in json.loads(content)["drafts"]}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def _finish(q, fields):
+    return UpdateOne(
+        {"_id": q["_id"], "draft_status": "running", "answered": False},
+        {"$set": fields, "$unset": {"draft_claim": ""}},
+    )
+
+
+async def draft_batch(db, queries) -> bool:
+    """Draft a claimed batch with one LLM call; False when the LLM was unavailable and the batch was handed back."""
+    now = datetime.now(timezone.utc)
+    items, skipped = [], []
+    for q in queries:
+        faqs = await _neighbours(db, q)
+        (items if faqs else skipped).append((q, faqs))
+    # nothing close enough to draft from; the teacher answers from scratch
+    updates = [_finish(q, {"draft_status": "skipped"}) for q, _ in skipped]
+    metrics.incr("drafts.skipped", len(skipped))
+
+    available = True
+    if items:
+        try:
+            response = await llm_gateway.ainvoke(_prompt(items), timeout=DRAFT_LLM_TIMEOUT_SECONDS)
+        except LLMUnavailable:
+            # rate limited or breaker open: hand the batch back for a later pass
+            available = False
+            retry_at = now + timedelta(seconds=DRAFT_RETRY_SECONDS)
+            updates += [_finish(q, {"draft_status": "pending", "draft_not_before": retry_at}) for q, _ in items]
+            metrics.incr("drafts.deferred", len(items))
+        else:
+            drafts = _parse_drafts(response.content)
+            for q, faqs in items:
+                draft = drafts.get(str(q["_id"]))
+                if draft:
+                    updates.append(_finish(q, {
+                        "draft_status": "ready",
+                        "draft_answer": draft,
+                        "draft_sources": [str(f["_id"]) for f in faqs],
+                        "drafted_at": now,
+                    }))
+                else:
+                    updates.append(_finish(q, {"draft_status": "failed"}))
+                metrics.incr("drafts.ready" if draft else "drafts.failed")
+
+    if updates:
+        await db["queries"].bulk_write(updates, ordered=False)
+    return available
+
+
+async def run_draft_worker(db):
+    """Background loop started from the app lifespan; safe to run in several workers."""
+    while True:
+        try:
+            batch = await _claim_batch(db)
+            if not batch:
+                await asyncio.sleep(DRAFT_POLL_SECONDS)
+                continue
+            if not await draft_batch(db, batch):
+                await asyncio.sleep(DRAFT_POLL_SECONDS)
+        except PyMongoError as e:
+            print(f"Draft worker error: {e}")
+            await asyncio.sleep(DRAFT_POLL_SECONDS)
@@ -0,0 +1,113 @@
+import io
+import csv
+import json
+import zlib
+import zstandard
+from datetime import datetime
+from bson import ObjectId
+from config import EXPORT_BATCH_SIZE, EXPORT_CHUNK_BYTES
+
+# Streaming exports: rows are read from a Mongo cursor in bounded batches and
+# written out in fixed-size chunks, so memory stays flat whatever the size.
+EXPORT_FIELDS = {
+    "queries": [
+        "_id", "course_id", "course_name", "student_id", "student_name", "student_roll", "question",
+        "answer", "answered", "created_at", "answered_at", "teacher_id",
+    ],
+    "faq": ["_id", "course_id", "question", "frequency", "answer", "created_at", "updated_at"],
+    "ratings": ["_id", "query_id", "course_id", "student_id", "teacher_id", "rating", "created_at"],
+}
+
+
+def export_fields(dataset: str, include_embeddings=False):
+    return EXPORT_FIELDS[dataset] + (["embedding"] if include_embeddings and dataset != "ratings" else [])
+
+
+def _filters(course_id=None, start=None, end=None):
+    filters = {}
+    if course_id:
+        filters["course_id"] = course_id
+    if start or end:
+        filters["created_at"] = {
+            **({"$gte": start} if start else {}),
+            **({"$lt": end} if end else {}),
+        }
+    return filters
+
+
+def export_cursor(db, dataset: str, course_id=None, start=None, end=None, include_embeddings=False):
+    projection = {field: 1 for field in export_fields(dataset, include_embeddings)}
+    if dataset == "queries":
+        return db["queries"].find(_filters(course_id, start, end), projection).batch_size(EXPORT_BATCH_SIZE)
+    if dataset == "faq":
+        return db["embedded_questions"].find(_filters(course_id, start, end), projection).batch_size(EXPORT_BATCH_SIZE)
+    # ratings carry no course_id of their own; resolve it from the rated query
+    return db["ratings"].aggregate([
+        {"$match": _filters(start=start, end=end)},
+        {"$lookup": {
+            "from": "queries",
+            "let": {"qid": {"$convert": {"input": "$query_id", "to": "objectId", "onError": None}}},
+            "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$qid"]}}}, {"$project": {"course_id": 1}}],
+            "as": "query",
+        }},
+        {"$set": {"course_id": {"$first": "$query.course_id"}}},
+        {"$match": _filters(course_id)},
+        {"$project": projection},
+    ], batchSize=EXPORT_BATCH_SIZE)
+
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_row(doc, fields):
+    return json.dumps({f: _plain(doc.get(f)) for f in fields}, ensure_ascii=False) + "\n"
+
+
+def _csv_row(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _compressor(compression: str):
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+async def stream_export(cursor, dataset: str, fmt: str, compression: str = "none", include_embeddings=False):
+    fields = export_fields(dataset, include_embeddings)
+    compressor = _compressor(compression)
+    buffer = []
+    size = 0
+
+    def flush():
+        data = "".join(buffer).encode("utf-8")
+        buffer.clear()
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        buffer.append(_csv_row(fields))
+    async for doc in cursor:
+        row = _ndjson_row(doc, fields) if fmt == "ndjson" else _csv_row(
+            [json.dumps(v) if isinstance(v, list) else _plain(v) for v in (doc.get(f) for f in fields)]
+        )
+        buffer.append(row)
+        size += len(row)
+        if size >= EXPORT_CHUNK_BYTES:
+            size = 0
+            chunk = flush()
+            if chunk:
+                yield chunk
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone, timedelta
+from pymongo.errors import DuplicateKeyError
+from config import IDEMPOTENCY_STALE_SECONDS
+
+# Stored responses for client-supplied Idempotency-Key headers, expired by a TTL index
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+
+async def claim(db, scope: str, key: str, request_hash: str):
+    """Claim `key` for this request.
+
+    Returns ("claimed", None), ("replay", (status, content)), ("in_progress", None)
+    or ("mismatch", None) when the key was used for a different request.
+    """
+    doc_id = f"{scope}:{key}"
+    now = datetime.now(timezone.utc)
+    try:
+        await db[IDEMPOTENCY_COLLECTION].insert_one({
+            "_id": doc_id,
+            "request_hash": request_hash,
+            "status": "in_progress",
+            "created_at": now,
+            "claimed_at": now,
+        })
+        return "claimed", None
+    except DuplicateKeyError:
+        doc = await db[IDEMPOTENCY_COLLECTION].find_one({"_id": doc_id})
+    if doc is None:
+        # expired between the insert and the read
+        return await claim(db, scope, key, request_hash)
+    if doc["request_hash"] != request_hash:
+        return "mismatch", None
+    if doc["status"] == "completed":
+        return "replay", (doc["response_status"], doc["response"])
+    # the worker holding the claim died or was cancelled mid-pipeline: take the claim over
+    claimed_at = doc.get("claimed_at", doc["created_at"])
+    if claimed_at.replace(tzinfo=timezone.utc) < now - timedelta(seconds=IDEMPOTENCY_STALE_SECONDS):
+        taken = await db[IDEMPOTENCY_COLLECTION].update_one(
+            {"_id": doc_id, "status": "in_progress", "claimed_at": doc.get("claimed_at")},
+            {"$set": {"claimed_at": now}},
+        )
+        if taken.modified_count:
+            return "claimed", None
+    return "in_progress", None
+
+
+async def complete(db, scope: str, key: str, status_code: int, content):
+    await db[IDEMPOTENCY_COLLECTION].update_one(
+        {"_id": f"{scope}:{key}"},
+        {"$set": {"status": "completed", "response_status": status_code, "response": content}},
+    )
+
+
+async def release(db, scope: str, key: str):
+    """Drop an unfinished claim so the client can retry."""
+    await db[IDEMPOTENCY_COLLECTION].delete_one({"_id": f"{scope}:{key}", "status": "in_progress"})
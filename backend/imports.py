@@ -0,0 +1,147 @@
+import csv
+import json
+import codecs
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from config import IMPORT_BATCH_SIZE
+from models import TeacherImportRow, SubjectImportRow, ImportRowError
+
+# Bulk import: rows are read from the request stream, validated a batch at a time,
+# resolved with one $in lookup per batch and written with insert_many(ordered=False).
+
+
+def _json_row(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None   # reported as a validation error for this row
+
+
+async def iter_rows(request):
+    """Yield (row_number, dict) from a CSV, NDJSON or JSON-array request body."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "application/json":
+        # a JSON array can't be parsed incrementally; use CSV or NDJSON for large files
+        rows = json.loads(await request.body())
+        for number, row in enumerate(rows if isinstance(rows, list) else [rows], start=1):
+            yield number, row
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    header = None
+    number = 0
+
+    def parse(lines):
+        nonlocal header, number
+        for values in csv.reader(lines):
+            if not values:
+                continue
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            number += 1
+            yield number, {h: v.strip() for h, v in zip(header, values) if v.strip() != ""}
+
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        if content_type == "application/x-ndjson":
+            for line in lines:
+                if line.strip():
+                    number += 1
+                    yield number, _json_row(line)
+        else:
+            for item in parse([line + "\n" for line in lines]):
+                yield item
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        if content_type == "application/x-ndjson":
+            yield number + 1, _json_row(pending)
+        else:
+            for item in parse([pending]):
+                yield item
+
+
+async def batched(rows, size=IMPORT_BATCH_SIZE):
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _validate(batch, model):
+    valid, errors = [], []
+    for number, raw in batch:
+        try:
+            valid.append((number, model.model_validate(raw)))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append(ImportRowError(row=number, detail=detail))
+    return valid, errors
+
+
+async def _insert(db, collection_name, rows):
+    """insert_many(ordered=False); returns inserted docs and per-row errors."""
+    if not rows:
+        return [], []
+    docs = [doc for _, doc in rows]
+    try:
+        await db[collection_name].insert_many(docs, ordered=False)
+        return docs, []
+    except BulkWriteError as e:
+        failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details["writeErrors"]}
+        errors = [ImportRowError(row=rows[i][0], detail=msg) for i, msg in failed.items()]
+        return [doc for i, doc in enumerate(docs) if i not in failed], errors
+
+
+async def import_teachers(db, batch, seen_emails):
+    valid, errors = _validate(batch, TeacherImportRow)
+
+    emails = [row.email for _, row in valid]
+    existing = {u["email"] for u in await db["users"].find({"email": {"$in": emails}}, {"email": 1}).to_list(None)}
+
+    rows = []
+    for number, row in valid:
+        if row.email in existing:
+            errors.append(ImportRowError(row=number, detail="Email already registered"))
+        elif row.email in seen_emails:
+            errors.append(ImportRowError(row=number, detail="Email listed more than once"))
+        else:
+            seen_emails.add(row.email)
+            rows.append((number, {**row.model_dump(), "role": "teacher"}))
+
+    inserted, write_errors = await _insert(db, "users", rows)
+    return inserted, errors + write_errors
+
+
+async def import_subjects(db, batch):
+    valid, errors = _validate(batch, SubjectImportRow)
+
+    # --- Resolve teacher references with a single $in lookup ---
+    ids = [ObjectId(row.teacher_id) for _, row in valid if row.teacher_id and ObjectId.is_valid(row.teacher_id)]
+    emails = [row.teacher_email for _, row in valid if row.teacher_email]
+    teachers = await db["users"].find(
+        {"role": "teacher", "$or": [{"_id": {"$in": ids}}, {"email": {"$in": emails}}]},
+        {"name": 1, "email": 1},
+    ).to_list(None)
+    by_id = {str(t["_id"]): t for t in teachers}
+    by_email = {t["email"]: t for t in teachers}
+
+    rows = []
+    for number, row in valid:
+        teacher = by_id.get(row.teacher_id) if row.teacher_id else by_email.get(row.teacher_email)
+        if not (row.teacher_id or row.teacher_email):
+            errors.append(ImportRowError(row=number, detail="teacher_id or teacher_email is required"))
+        elif teacher is None:
+            errors.append(ImportRowError(row=number, detail="Teacher not found"))
+        else:
+            rows.append((number, {"name": row.name, "teacher_id": str(teacher["_id"]), "teacher_name": teacher["name"]}))
+
+    inserted, write_errors = await _insert(db, "courses", rows)
+    return inserted, errors + write_errors
@@ -1,18 +1,51 @@
 import torch
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import client
+import database
+from config import DRAFTS_ENABLED
+from database import ensure_indexes
 from routes.auth_routes import router as auth_router
 from routes.course_routes import router as course_router
 from routes.query_routes import router as query_router
 from routes.admin_routes import router as admin_router
-from ai_clients import hf_client, llm
+from ai_clients import hf_client, llm, llm_gateway
+import moderation_model
+import course_profiles
+import metrics
+from catalog import course_catalog
+from cleanup import run_cleanup_worker
+from moderation_queue import run_moderation_worker
+from drafts import run_draft_worker
 from huggingface_hub import InferenceClient
 from sentence_transformers import SentenceTransformer
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = database.connect()
+    await ensure_indexes()
+    await course_catalog.load(db)
+    catalog_sync = course_catalog.start_sync(db)
+    moderation_model.load_moderation_model()
+    await course_profiles.load_profiles(db)
+    cleanup_worker = asyncio.create_task(run_cleanup_worker(db))
+    moderation_worker = asyncio.create_task(run_moderation_worker(db))
+    draft_worker = asyncio.create_task(run_draft_worker(db)) if DRAFTS_ENABLED else None
+    yield
+    cleanup_worker.cancel()
+    moderation_worker.cancel()
+    if draft_worker:
+        draft_worker.cancel()
+    if catalog_sync:
+        catalog_sync.cancel()
+    database.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow requests from Expo dev client
 app.add_middleware(
@@ -34,4 +67,19 @@ app.include_router(admin_router)
 
 @app.get("/")
 async def root():
-    return {"message": "CodeYatra API is running"}
\ No newline at end of file
+    return {"message": "CodeYatra API is running"}
+
+
+@app.get("/health/llm")
+async def llm_health():
+    return llm_gateway.snapshot()
+
+
+@app.get("/health/moderation")
+async def moderation_health():
+    return moderation_model.snapshot()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,46 @@
+import threading
+from collections import Counter, deque
+
+# In-process counters exported at GET /metrics
+counters = Counter()
+_ratios = {}
+_samples = {}
+_lock = threading.Lock()
+SAMPLE_WINDOW = 1000
+
+
+def incr(name: str, n: int = 1):
+    with _lock:  # also called from driver threads (database.PoolWaitListener)
+        counters[name] += n
+
+
+def observe(name: str, value: float):
+    """Record one sample (e.g. a latency); the last SAMPLE_WINDOW are summarized. Thread-safe."""
+    with _lock:
+        _samples.setdefault(name, deque(maxlen=SAMPLE_WINDOW)).append(value)
+        counters[f"{name}.count"] += 1
+
+
+def _summary(values):
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+
+def register_ratio(name: str, numerator: str, denominator: str):
+    _ratios[name] = (numerator, denominator)
+
+
+def snapshot() -> dict:
+    ratios = {
+        name: round(counters[num] / counters[den], 4) if counters[den] else None
+        for name, (num, den) in _ratios.items()
+    }
+    with _lock:
+        current = dict(counters)
+        windows = {name: list(values) for name, values in _samples.items() if values}
+    return {
+        "counters": current,
+        "ratios": ratios,
+        "samples": {name: _summary(values) for name, values in windows.items()},
+    }
@@ -40,14 +40,49 @@ class CourseResponse(BaseModel):
     teacher_name: str
 
 
+# ── Admin bulk import ──
+class TeacherImportRow(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+    roll: str = ""
+
+class SubjectImportRow(BaseModel):
+    name: str
+    teacher_id: Optional[str] = None
+    teacher_email: Optional[EmailStr] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    detail: str
+
+class ImportResult(BaseModel):
+    inserted: int = 0
+    errors: List[ImportRowError] = []
+
+
 
 class QueryCreate(BaseModel):
     course_id: str
     question: str
 
 class QueryAnswer(BaseModel):
+    answer: Optional[str] = None        # omitted: confirm the query's ready draft as the answer
+    propagate: bool = True
+    exclude_query_ids: List[str] = []   # similar pending queries the teacher opted out of
+
+class BulkAnswerItem(BaseModel):
+    query_id: str
     answer: str
 
+class BulkAnswerRequest(BaseModel):
+    items: List[BulkAnswerItem]
+
+class BulkAnswerItemResult(BaseModel):
+    query_id: str
+    status: Literal["answered", "invalid", "duplicate", "not_found", "forbidden"]
+    detail: Optional[str] = None
+
 class QueryResponse(BaseModel):
     id: str
     course_id: str
@@ -61,6 +96,34 @@ class QueryResponse(BaseModel):
     created_at: str
     answered_at: Optional[str] = None
     teacher_id: str = ""
+    degraded_stages: List[str] = []
+    draft_answer: Optional[str] = None  # teacher views only
+    draft_status: Optional[str] = None
+
+class QueryAnswerResponse(QueryResponse):
+    propagated_query_ids: List[str] = []
+
+class SimilarPendingQueryResponse(QueryResponse):
+    similarity: float
+
+
+
+class CourseStudentSummary(BaseModel):
+    student_id: str
+    student_roll: str
+    student_name: str = "Anonymous"
+    has_pending: bool = False
+    total_queries: int = 0
+    pending_queries: int = 0
+    last_activity: Optional[str] = None
+
+class TeacherCourseSummary(BaseModel):
+    course_id: str
+    course_name: str = ""
+    total_queries: int = 0
+    pending_queries: int = 0
+    students: int = 0
+    last_activity: Optional[str] = None
 
 
 
@@ -73,6 +136,10 @@ class NotificationResponse(BaseModel):
     read: bool = False
     created_at: str
 
+class NotificationReadRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    up_to: Optional[str] = None   # notification id cursor: everything at or before it
+
 
 # ── Rating ──
 class RatingCreate(BaseModel):
@@ -104,6 +171,21 @@ class EmbeddedQuestionCreate(BaseModel):
     created_at: Optional[str] = None
 
 
+class FaqSearchResult(BaseModel):
+    id: str
+    source: Literal["faq", "query"]
+    question: str
+    answer: Optional[str] = None
+    frequency: int = 0
+    score: float
+
+
+class FaqSuggestion(BaseModel):
+    id: str
+    question: str
+    frequency: int = 0
+
+
 class EmbeddedQuestionResponse(BaseModel):
     id: str
     course_id: Optional[str]
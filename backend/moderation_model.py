@@ -0,0 +1,101 @@
+import os
+import re
+import joblib
+import numpy as np
+from datetime import datetime, timezone
+from config import (
+    EMBEDDING_MODEL_VERSION, MODERATION_MODEL_DIR, MODERATION_MODEL_VERSION,
+    MODERATION_LOCAL_SAFE_THRESHOLD, MODERATION_LOCAL_UNSAFE_THRESHOLD,
+)
+
+# Local moderation classifier trained on past LLM verdicts (scripts/train_moderation.py)
+VERDICTS_COLLECTION = "moderation_verdicts"
+ARTIFACT_PATTERN = re.compile(r"^moderation-v(\d+)\.joblib$")
+
+_artifact = None
+stats = {"local_safe": 0, "local_unsafe": 0, "escalated": 0}
+
+
+def artifact_versions(model_dir: str = MODERATION_MODEL_DIR) -> list[int]:
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(int(m.group(1)) for m in map(ARTIFACT_PATTERN.match, os.listdir(model_dir)) if m)
+
+
+def artifact_path(version: int, model_dir: str = MODERATION_MODEL_DIR) -> str:
+    return os.path.join(model_dir, f"moderation-v{version}.joblib")
+
+
+def load_moderation_model():
+    """Load the pinned (or latest) artifact; the LLM handles everything if none is usable."""
+    global _artifact
+    versions = artifact_versions()
+    version = int(MODERATION_MODEL_VERSION) if MODERATION_MODEL_VERSION else (versions[-1] if versions else None)
+    if version is None or version not in versions:
+        _artifact = None
+        return None
+    artifact = joblib.load(artifact_path(version))
+    if artifact.get("embedding_version") != EMBEDDING_MODEL_VERSION:
+        print(f"Moderation model v{version} was trained on {artifact.get('embedding_version')}, not loading it")
+        _artifact = None
+        return None
+    _artifact = artifact
+    return artifact
+
+
+def is_loaded() -> bool:
+    return _artifact is not None
+
+
+def decide(classifier, embedding, safe_threshold=MODERATION_LOCAL_SAFE_THRESHOLD,
+           unsafe_threshold=MODERATION_LOCAL_UNSAFE_THRESHOLD, force=False):
+    """Local verdict for one embedding, or None when it falls in the uncertain band."""
+    proba = classifier.predict_proba(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+    labels = list(classifier.classes_)
+    p_safe = proba[labels.index("SAFE")]
+    unsafe = max((i for i, label in enumerate(labels) if label != "SAFE"), key=lambda i: proba[i])
+    if p_safe >= safe_threshold or (force and p_safe >= 0.5):
+        return {"label": "SAFE", "confidence": float(p_safe), "blocked": False}
+    if 1 - p_safe >= unsafe_threshold or force:
+        return {"label": labels[unsafe], "confidence": float(1 - p_safe), "blocked": True}
+    return None
+
+
+def classify(embedding, force: bool = False):
+    """Verdict from the loaded model; `force` decides the uncertain band too (degraded mode)."""
+    if _artifact is None or embedding is None:
+        return None
+    verdict = decide(_artifact["classifier"], embedding, force=force)
+    if verdict is None:
+        stats["escalated"] += 1
+        return None
+    stats["local_unsafe" if verdict["blocked"] else "local_safe"] += 1
+    return {**verdict, "source": f"local_v{_artifact['version']}"}
+
+
+async def record_llm_verdict(db, text, embedding, verdict):
+    """Keep LLM verdicts as labelled training data for the next model refresh."""
+    if embedding is None or verdict.get("source") != "llm":
+        return
+    await db[VERDICTS_COLLECTION].insert_one({
+        "question": text,
+        "embedding": embedding,
+        "embedding_version": EMBEDDING_MODEL_VERSION,
+        "label": verdict.get("label"),
+        "confidence": verdict.get("confidence", 0),
+        "blocked": verdict.get("blocked", False),
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+def snapshot() -> dict:
+    decided = stats["local_safe"] + stats["local_unsafe"]
+    total = decided + stats["escalated"]
+    return {
+        "loaded": _artifact is not None,
+        "version": _artifact["version"] if _artifact else None,
+        "trained_at": _artifact["trained_at"] if _artifact else None,
+        "training_report": _artifact["report"] if _artifact else None,
+        **stats,
+        "escalation_rate": round(stats["escalated"] / total, 4) if total else None,
+    }
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+import metrics
+import notifications
+from aimodels import moderate_text
+from moderation_model import record_llm_verdict
+from counters import record_queries_flagged
+from config import MODERATION_QUEUE_POLL_SECONDS, MODERATION_QUEUE_RETRY_SECONDS, MODERATION_QUEUE_MAX_ATTEMPTS, MODERATION_QUEUE_STALE_SECONDS
+
+# Questions stored while their moderation stage was degraded are re-checked here with the LLM;
+# a blocking verdict flags the query and pulls it from the teacher's queue.
+QUEUE_COLLECTION = "moderation_queue"
+
+
+async def enqueue(db, query_id, question: str, embedding):
+    now = datetime.now(timezone.utc)
+    await db[QUEUE_COLLECTION].insert_one({
+        "query_id": str(query_id),
+        "question": question,
+        "embedding": embedding,
+        "status": "pending",
+        "attempts": 0,
+        "not_before": now,
+        "created_at": now,
+    })
+    metrics.incr("moderation_queue.enqueued")
+
+
+async def _claim(db):
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=MODERATION_QUEUE_STALE_SECONDS)
+    return await db[QUEUE_COLLECTION].find_one_and_update(
+        {"$or": [
+            {"status": "pending", "not_before": {"$lte": now}},
+            {"status": "running", "claimed_at": {"$lt": stale}},
+        ]},
+        {"$set": {"status": "running", "claimed_at": now}, "$inc": {"attempts": 1}},
+        sort=[("not_before", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_job(db, job):
+    verdict = await moderate_text(job["question"], job.get("embedding"))
+    if verdict.get("degraded"):
+        # still only a fallback verdict (a confident local or LLM one is accepted)
+        if job["attempts"] >= MODERATION_QUEUE_MAX_ATTEMPTS:
+            await db[QUEUE_COLLECTION].update_one(
+                {"_id": job["_id"]}, {"$set": {"status": "abandoned", "finished_at": datetime.now(timezone.utc)}}
+            )
+            metrics.incr("moderation_queue.abandoned")
+            return
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=MODERATION_QUEUE_RETRY_SECONDS)
+        await db[QUEUE_COLLECTION].update_one(
+            {"_id": job["_id"]}, {"$set": {"status": "pending", "not_before": retry_at}}
+        )
+        return
+    await record_llm_verdict(db, job["question"], job.get("embedding"), verdict)
+
+    if verdict.get("blocked") and verdict.get("confidence", 0) > 0.8:
+        query = await db["queries"].find_one_and_update(
+            {"_id": ObjectId(job["query_id"]), "answered": False, "moderation_flagged": {"$ne": True}},
+            {"$set": {"moderation_flagged": True, "moderation_label": verdict.get("label")}},
+            projection={"teacher_id": 1, "course_id": 1, "student_id": 1},
+        )
+        if query is not None:
+            await notifications.remove_for_queries(db, query["teacher_id"], [job["query_id"]])
+            await record_queries_flagged(db, [query], datetime.now(timezone.utc))
+            metrics.incr("moderation_queue.flagged")
+    await db[QUEUE_COLLECTION].update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "done", "label": verdict.get("label"), "finished_at": datetime.now(timezone.utc)}},
+    )
+
+
+async def run_moderation_worker(db):
+    """Background loop started from the app lifespan; safe to run in several workers."""
+    while True:
+        try:
+            job = await _claim(db)
+            if job is None:
+                await asyncio.sleep(MODERATION_QUEUE_POLL_SECONDS)
+                continue
+            await run_job(db, job)
+        except PyMongoError as e:
+            print(f"Moderation worker error: {e}")
+            await asyncio.sleep(MODERATION_QUEUE_POLL_SECONDS)
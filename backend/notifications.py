@@ -0,0 +1,77 @@
+from collections import Counter
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from database import relaxed_collection
+
+# All writes to `notifications` go through here so the per-user unread counters stay exact
+NOTIFICATIONS = "notifications"
+UNREAD_COUNTERS = "notification_counters"
+
+
+def _writes(db):
+    return relaxed_collection(db, NOTIFICATIONS)
+
+
+async def _adjust_unread(db, deltas: Counter):
+    # no upsert: a user without a counter is seeded from count_documents on first read,
+    # which also covers notifications from before the counters existed
+    updates = [UpdateOne({"_id": user_id}, {"$inc": {"unread": n}}) for user_id, n in deltas.items() if n]
+    if updates:
+        await db[UNREAD_COUNTERS].bulk_write(updates, ordered=False)
+
+
+async def notify(db, docs):
+    if not docs:
+        return
+    await _writes(db).insert_many(docs, ordered=False)
+    await _adjust_unread(db, Counter(d["user_id"] for d in docs if not d.get("read", False)))
+
+
+async def remove_for_queries(db, user_id: str, query_ids):
+    query_filter = {"user_id": user_id, "query_id": {"$in": list(query_ids)}}
+    unread = await _writes(db).delete_many({**query_filter, "read": False})
+    await _writes(db).delete_many(query_filter)
+    await _adjust_unread(db, Counter({user_id: -unread.deleted_count}))
+
+
+async def delete_matching(db, filters):
+    """Delete notifications matching `filters` (keep the match bounded) and take the unread ones off the counters."""
+    unread_by_user = {}
+    for n in await db[NOTIFICATIONS].find({**filters, "read": False}, {"user_id": 1}).to_list(None):
+        unread_by_user.setdefault(n["user_id"], []).append(n["_id"])
+    deltas = Counter()
+    for user_id, ids in unread_by_user.items():
+        # conditional on read: False so one marked read meanwhile isn't decremented twice
+        deltas[user_id] -= (await _writes(db).delete_many({"_id": {"$in": ids}, "read": False})).deleted_count
+    deleted = sum(-n for n in deltas.values())
+    deleted += (await _writes(db).delete_many(filters)).deleted_count
+    await _adjust_unread(db, deltas)
+    return deleted
+
+
+async def mark_read(db, user_id: str, extra_filter=None):
+    """Mark the user's unread notifications matching `extra_filter` read; read ones expire via TTL."""
+    result = await _writes(db).update_many(
+        {"user_id": user_id, "read": False, **(extra_filter or {})},
+        {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}},
+    )
+    await _adjust_unread(db, Counter({user_id: -result.modified_count}))
+    return result.modified_count
+
+
+async def unread_count(db, user_id: str) -> int:
+    counter = await db[UNREAD_COUNTERS].find_one({"_id": user_id})
+    if counter is None:
+        unread = await db[NOTIFICATIONS].count_documents({"user_id": user_id, "read": False})
+        await db[UNREAD_COUNTERS].update_one({"_id": user_id}, {"$setOnInsert": {"unread": unread}}, upsert=True)
+        return unread
+    return counter["unread"]
+
+
+async def rebuild_unread_counters(db):
+    await db[UNREAD_COUNTERS].update_many({}, {"$set": {"unread": 0}})
+    await db[NOTIFICATIONS].aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}},
+        {"$merge": {"into": UNREAD_COUNTERS, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(None)
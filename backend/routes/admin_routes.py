@@ -1,11 +1,20 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Literal, Optional
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 from database import get_database
 from auth import get_current_user
-from models import UserRegister, UserResponse, CourseCreate, CourseResponse
+from models import UserRegister, UserResponse, CourseCreate, CourseResponse, ImportResult
+from catalog import course_catalog
+from exports import export_cursor, stream_export
+import cleanup
+from imports import iter_rows, batched, import_teachers, import_subjects
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+EXPORT_COMPRESSION = {"none": None, "gzip": (".gz", "application/gzip"), "zstd": (".zst", "application/zstd")}
+
 
 def _require_admin(current_user):
     if current_user["role"] != "admin":
@@ -55,6 +64,43 @@ async def create_teacher(body: UserRegister, current_user=Depends(get_current_us
     )
 
 
+# bulk import teachers (CSV, NDJSON or JSON array)
+@router.post("/teachers/import", response_model=ImportResult)
+async def import_teachers_bulk(request: Request, current_user=Depends(get_current_user)):
+    _require_admin(current_user)
+    db = get_database()
+    result = ImportResult()
+    seen_emails = set()
+    try:
+        async for batch in batched(iter_rows(request)):
+            inserted, errors = await import_teachers(db, batch, seen_emails)
+            result.inserted += len(inserted)
+            result.errors.extend(errors)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed import file")
+    result.errors.sort(key=lambda e: e.row)
+    return result
+
+
+# bulk import subjects, teacher referenced by teacher_id or teacher_email
+@router.post("/subjects/import", response_model=ImportResult)
+async def import_subjects_bulk(request: Request, current_user=Depends(get_current_user)):
+    _require_admin(current_user)
+    db = get_database()
+    result = ImportResult()
+    try:
+        async for batch in batched(iter_rows(request)):
+            inserted, errors = await import_subjects(db, batch)
+            if inserted:
+                await course_catalog.add_many(db, inserted)
+            result.inserted += len(inserted)
+            result.errors.extend(errors)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed import file")
+    result.errors.sort(key=lambda e: e.row)
+    return result
+
+
 # subject create and assign teacher
 @router.post("/subjects", response_model=CourseResponse, status_code=201)
 async def create_subject(body: CourseCreate, current_user=Depends(get_current_user)):
@@ -73,6 +119,7 @@ async def create_subject(body: CourseCreate, current_user=Depends(get_current_us
     }
     result = await db["courses"].insert_one(doc)
     doc["_id"] = result.inserted_id
+    await course_catalog.add(db, doc)
     return CourseResponse(
         id=str(doc["_id"]),
         name=doc["name"],
@@ -85,8 +132,6 @@ async def create_subject(body: CourseCreate, current_user=Depends(get_current_us
 @router.get("/subjects", response_model=list[CourseResponse])
 async def list_subjects(current_user=Depends(get_current_user)):
     _require_admin(current_user)
-    db = get_database()
-    courses = await db["courses"].find().to_list(200)
     return [
         CourseResponse(
             id=str(c["_id"]),
@@ -94,7 +139,7 @@ async def list_subjects(current_user=Depends(get_current_user)):
             teacher_id=c["teacher_id"],
             teacher_name=c["teacher_name"],
         )
-        for c in courses
+        for c in course_catalog.all()
     ]
 
 
@@ -103,9 +148,15 @@ async def list_subjects(current_user=Depends(get_current_user)):
 async def delete_subject(subject_id: str, current_user=Depends(get_current_user)):
     _require_admin(current_user)
     db = get_database()
-    result = await db["courses"].delete_one({"_id": ObjectId(subject_id)})
-    if result.deleted_count == 0:
+    # tombstone now; queries, FAQ, notifications and ratings are swept in the background
+    result = await db["courses"].update_one(
+        {"_id": ObjectId(subject_id), "deleted_at": {"$exists": False}},
+        {"$set": {"deleted_at": datetime.now(timezone.utc)}},
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Subject not found")
+    await course_catalog.remove(db, [subject_id])
+    await cleanup.enqueue(db, "course", subject_id, [subject_id])
     return {"message": "Subject deleted"}
 
 
@@ -117,6 +168,40 @@ async def delete_teacher(teacher_id: str, current_user=Depends(get_current_user)
     result = await db["users"].delete_one({"_id": ObjectId(teacher_id), "role": "teacher"})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Teacher not found")
-    # Also remove subjects assigned to this teacher
-    await db["courses"].delete_many({"teacher_id": teacher_id})
+    # Also remove subjects assigned to this teacher (tombstoned, swept in the background)
+    courses = await db["courses"].find({"teacher_id": teacher_id}, {"_id": 1}).to_list(None)
+    course_ids = [str(c["_id"]) for c in courses]
+    await db["courses"].update_many(
+        {"teacher_id": teacher_id, "deleted_at": {"$exists": False}},
+        {"$set": {"deleted_at": datetime.now(timezone.utc)}},
+    )
+    await course_catalog.remove(db, course_ids)
+    await cleanup.enqueue(db, "teacher", teacher_id, course_ids)
     return {"message": "Teacher and assigned subjects deleted"}
+
+
+# streaming export of queries, FAQ and ratings
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: Literal["queries", "faq", "ratings"],
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    course_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    compression: Literal["none", "gzip", "zstd"] = "none",
+    include_embeddings: bool = False,
+    current_user=Depends(get_current_user),
+):
+    _require_admin(current_user)
+    db = get_database()
+    cursor = export_cursor(db, dataset, course_id, start, end, include_embeddings)
+
+    extension, media_type = EXPORT_COMPRESSION[compression] or (
+        "", "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    )
+    filename = f"{dataset}{'-' + course_id if course_id else ''}.{fmt}{extension}"
+    return StreamingResponse(
+        stream_export(cursor, dataset, fmt, compression, include_embeddings),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
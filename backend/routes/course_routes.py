@@ -3,6 +3,7 @@ from bson import ObjectId
 from database import get_database
 from auth import get_current_user
 from models import CourseCreate, CourseResponse
+from catalog import course_catalog
 
 router = APIRouter(prefix="/courses", tags=["Courses / Subjects"])
 
@@ -19,9 +20,7 @@ def _course_doc(c) -> CourseResponse:
 # all subejcts
 @router.get("/", response_model=list[CourseResponse])
 async def list_subjects(current_user=Depends(get_current_user)):
-    db = get_database()
-    courses = await db["courses"].find().to_list(100)
-    return [_course_doc(c) for c in courses]
+    return [_course_doc(c) for c in course_catalog.all()]
 
 
 # create subject
@@ -33,6 +32,7 @@ async def create_subject(body: CourseCreate, current_user=Depends(get_current_us
     doc = body.model_dump()
     result = await db["courses"].insert_one(doc)
     doc["_id"] = result.inserted_id
+    await course_catalog.add(db, doc)
     return _course_doc(doc)
 
 
@@ -41,7 +41,5 @@ async def create_subject(body: CourseCreate, current_user=Depends(get_current_us
 async def teaching_subjects(current_user=Depends(get_current_user)):
     if current_user["role"] != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers")
-    db = get_database()
     teacher_id = str(current_user["_id"])
-    courses = await db["courses"].find({"teacher_id": teacher_id}).to_list(100)
-    return [_course_doc(c) for c in courses]
+    return [_course_doc(c) for c in course_catalog.for_teacher(teacher_id)]
@@ -1,17 +1,36 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import json
+import uuid
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
 from datetime import datetime, timezone
-from database import get_database
+from database import get_database, get_secondary_database
+from moderation_model import record_llm_verdict
+import course_profiles
+import metrics
+import notifications
+import typeahead
+import idempotency
+import moderation_queue
+from deadline import Deadline
+from singleflight import SingleFlight
+from catalog import course_catalog
+from counters import STUDENT_COUNTERS, COURSE_COUNTERS, record_query_created, record_queries_answered, ensure_course_counters
 from auth import get_current_user
-from models import QueryCreate, QueryAnswer, QueryResponse, NotificationResponse, RatingCreate, RatingResponse, TeacherRatingResponse, EmbeddedQuestionResponse
-from aimodels import moderate_text, get_embedding, find_best_match, detect_subject_relevance, search_answered_questions_vector, search_faq_vector
-from config import EMBEDDING_SIMILARITY_THRESHOLD, EMBEDDING_SEARCH_CANDIDATES, SUBJECT_VALIDATION_ENABLED, SUBJECT_VALIDATION_CONFIDENCE_THRESHOLD
+from models import QueryCreate, QueryAnswer, QueryResponse, QueryAnswerResponse, SimilarPendingQueryResponse, BulkAnswerRequest, BulkAnswerItemResult, CourseStudentSummary, TeacherCourseSummary, NotificationResponse, NotificationReadRequest, RatingCreate, RatingResponse, TeacherRatingResponse, EmbeddedQuestionResponse, FaqSearchResult, FaqSuggestion
+from aimodels import question_hash, moderate_text, get_embedding, find_best_match, detect_subject_relevance, search_answered_questions_vector, search_faq_vector, search_pending_questions_vector, hybrid_faq_search
+from config import DRAFTS_ENABLED, CREATE_QUERY_DEADLINE_SECONDS, CREATE_QUERY_WRITE_RESERVE_SECONDS, EMBEDDING_MODEL_VERSION, EMBEDDING_SIMILARITY_THRESHOLD, EMBEDDING_SEARCH_CANDIDATES, SUBJECT_VALIDATION_ENABLED, SUBJECT_VALIDATION_CONFIDENCE_THRESHOLD, ANSWER_PROPAGATION_ENABLED, ANSWER_PROPAGATION_THRESHOLD, ANSWER_PROPAGATION_LIMIT, BULK_ANSWER_MAX_ITEMS, TYPEAHEAD_MAX_RESULTS, TYPEAHEAD_MAX_QUESTION_CHARS
 
 router = APIRouter(prefix="/queries", tags=["Queries"])
 
+metrics.register_ratio("create_query.exact_match_rate", "create_query.exact_match", "create_query.requests")
+metrics.register_ratio("create_query.semantic_match_rate", "create_query.semantic_match", "create_query.requests")
 
-def _query_doc(q, anonymous: bool = False) -> QueryResponse:
+
+def _query_doc(q, anonymous: bool = False, include_draft: bool = False) -> QueryResponse:
     return QueryResponse(
         id=str(q["_id"]),
         course_id=q["course_id"],
@@ -25,6 +44,8 @@ def _query_doc(q, anonymous: bool = False) -> QueryResponse:
         created_at=q["created_at"].isoformat() if isinstance(q["created_at"], datetime) else q["created_at"],
         answered_at=q["answered_at"].isoformat() if q.get("answered_at") and isinstance(q["answered_at"], datetime) else q.get("answered_at"),
         teacher_id=q.get("teacher_id", ""),
+        draft_answer=q.get("draft_answer") if include_draft else None,
+        draft_status=q.get("draft_status") if include_draft else None,
     )
 
 
@@ -41,20 +62,122 @@ def _notif_doc(n) -> NotificationResponse:
 
 
 
+_create_flights = SingleFlight()
+_flight_idempotency_keys = {}  # flight key -> Idempotency-Keys waiting on that flight
+
+
+def _as_response(result):
+    """(status, JSON content) for a pipeline result, so it can be shared and stored."""
+    if isinstance(result, JSONResponse):
+        return result.status_code, json.loads(result.body)
+    return 201, jsonable_encoder(result)
+
+
 @router.post("/", response_model=QueryResponse, status_code=201)
-async def create_query(body: QueryCreate, current_user=Depends(get_current_user)):
+async def create_query(
+    body: QueryCreate,
+    current_user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=200),
+):
     if current_user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can ask queries")
 
     db = get_database()
     student_id = str(current_user["_id"])
 
-    course = await db["courses"].find_one({"_id": ObjectId(body.course_id)})
+    course = await course_catalog.get(db, body.course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    # --- Moderation (Awaited) ---
-    moderation = await moderate_text(body.question)
+    # --- Idempotency key & single-flight coalescing of identical submissions ---
+    request_hash = f"{body.course_id}:{question_hash(body.question)}"
+    flight_key = (student_id, request_hash)
+    if idempotency_key:
+        state, stored = await idempotency.claim(db, student_id, idempotency_key, request_hash)
+        if state == "mismatch":
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different question")
+        if state == "replay":
+            metrics.incr("create_query.idempotent_replay")
+            return JSONResponse(status_code=stored[0], content=stored[1], headers={"Idempotent-Replayed": "true"})
+        if state == "in_progress" and not _create_flights.in_flight(flight_key):
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+    if _create_flights.in_flight(flight_key):
+        metrics.incr("create_query.coalesced")
+    if idempotency_key:
+        _flight_idempotency_keys.setdefault(flight_key, set()).add(idempotency_key)
+
+    async def run():
+        # runs shielded, so the keys are completed (or released) even if every caller went away
+        try:
+            deadline = Deadline(CREATE_QUERY_DEADLINE_SECONDS, reserve=CREATE_QUERY_WRITE_RESERVE_SECONDS)
+            status_code, content = _as_response(await _run_create_query(db, body, current_user, course, deadline))
+            # stages that ran out of budget (or had no backend) and fell back to their degraded result
+            content["degraded_stages"] = deadline.degraded
+        except BaseException:
+            for key in _flight_idempotency_keys.pop(flight_key, ()):
+                await idempotency.release(db, student_id, key)
+            raise
+        for key in _flight_idempotency_keys.pop(flight_key, ()):
+            await idempotency.complete(db, student_id, key, status_code, content)
+        return status_code, content
+
+    try:
+        status_code, content = await _create_flights.do(flight_key, run)
+    except Exception:
+        if idempotency_key:
+            await idempotency.release(db, student_id, idempotency_key)
+        raise
+    if idempotency_key:
+        # a key registered after the flight stored its results is completed here
+        await idempotency.complete(db, student_id, idempotency_key, status_code, content)
+    return JSONResponse(status_code=status_code, content=content)
+
+
+async def _run_create_query(db, body: QueryCreate, current_user, course, deadline: Deadline):
+    student_id = str(current_user["_id"])
+    metrics.incr("create_query.requests")
+
+    # --- Step 0: Exact-match short circuit (skips LLM and vector stages) ---
+    q_hash = question_hash(body.question)
+    exact = await db["embedded_questions"].find_one_and_update(
+        {"course_id": body.course_id, "question_hash": q_hash, "answer": {"$ne": None}},
+        {"$inc": {"frequency": 1}},
+        projection={"question": 1, "answer": 1, "frequency": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if exact is None:
+        exact = await db["queries"].find_one(
+            {"course_id": body.course_id, "question_hash": q_hash, "answered": True},
+            {"question": 1, "answer": 1},
+        )
+    if exact is not None:
+        metrics.incr("create_query.exact_match")
+        if "frequency" in exact:
+            typeahead.set_frequency(body.course_id, str(exact["_id"]), exact["frequency"])
+        return JSONResponse(
+            status_code=200,
+            content={
+                "matched": True,
+                "exact": True,
+                "similarity": 1.0,
+                "faq": {
+                    "id": str(exact["_id"]),
+                    "question": exact["question"],
+                    "answer": exact["answer"],
+                    **({"frequency": exact["frequency"]} if "frequency" in exact else {}),
+                },
+            },
+        )
+
+    # --- Generate embedding (Awaited; degraded: no embedding, so no vector stages) ---
+    try:
+        query_emb = await get_embedding(body.question, deadline=deadline)
+    except Exception:
+        query_emb = None
+
+    # --- Moderation (Awaited; degraded: fallback verdict now, LLM re-check queued) ---
+    moderation = await moderate_text(body.question, query_emb, deadline=deadline)
+    await record_llm_verdict(db, body.question, query_emb, moderation)
     if moderation.get("blocked") and moderation.get("confidence", 0) > 0.8:
         return JSONResponse(
             status_code=400,
@@ -65,9 +188,11 @@ async def create_query(body: QueryCreate, current_user=Depends(get_current_user)
             },
         )
 
-    # --- Subject Validation (Awaited) ---
+    # --- Subject Validation (Awaited; degraded: skipped) ---
     if SUBJECT_VALIDATION_ENABLED:
-        subject_check = await detect_subject_relevance(body.question, course["name"])
+        subject_check = await detect_subject_relevance(
+            body.question, course["name"], db=db, course=course, question_embedding=query_emb, deadline=deadline
+        )
         if not subject_check.get("is_relevant"):
             return JSONResponse(
                 status_code=400,
@@ -78,24 +203,19 @@ async def create_query(body: QueryCreate, current_user=Depends(get_current_user)
                 },
             )
 
-    # --- Generate embedding (Awaited) ---
-    try:
-        query_emb = await get_embedding(body.question)
-    except Exception:
-        query_emb = None
-
     embedded_question_id = None
 
-    # --- Step 1: Check Answered Queries (Awaited) ---
+    # --- Step 1: Check Answered Queries (Awaited; degraded: no match) ---
     if query_emb is not None:
         answered = await search_answered_questions_vector(
-            db, query_emb, body.course_id, limit=1
+            db, query_emb, body.course_id, limit=1, deadline=deadline
         )
         if answered:
             best = answered[0]
             score = best.get("similarityScore", 0)
 
             if score >= EMBEDDING_SIMILARITY_THRESHOLD:
+                metrics.incr("create_query.semantic_match")
                 return JSONResponse(
                     status_code=200,
                     content={
@@ -109,9 +229,9 @@ async def create_query(body: QueryCreate, current_user=Depends(get_current_user)
                     },
                 )
 
-    # --- Step 2: Check Existing FAQ (Awaited) ---
+    # --- Step 2: Check Existing FAQ (Awaited; degraded: no match) ---
     if query_emb is not None:
-        faqs = await search_faq_vector(db, query_emb, body.course_id, limit=1)
+        faqs = await search_faq_vector(db, query_emb, body.course_id, limit=1, deadline=deadline)
 
         if faqs:
             best = faqs[0]
@@ -122,6 +242,8 @@ async def create_query(body: QueryCreate, current_user=Depends(get_current_user)
                     {"_id": best["_id"]},
                     {"$inc": {"frequency": 1}}
                 )
+                metrics.incr("create_query.semantic_match")
+                typeahead.set_frequency(body.course_id, str(best["_id"]), best.get("frequency", 0) + 1)
 
                 return JSONResponse(
                     status_code=200,
@@ -142,7 +264,9 @@ async def create_query(body: QueryCreate, current_user=Depends(get_current_user)
         embedded_doc = await db["embedded_questions"].insert_one({
             "course_id": body.course_id,
             "question": body.question,
+            "question_hash": q_hash,
             "embedding": query_emb,
+            "embedding_version": EMBEDDING_MODEL_VERSION,
             "frequency": 1,
             "answer": None,
             "created_at": datetime.now(timezone.utc),
@@ -158,90 +282,247 @@ async def create_query(body: QueryCreate, current_user=Depends(get_current_user)
         "student_name": current_user["name"],
         "student_roll": current_user.get("roll", ""),
         "question": body.question,
+        "question_hash": q_hash,
         "embedding": query_emb,
+        "embedding_version": EMBEDDING_MODEL_VERSION if query_emb is not None else None,
         "embedded_question_id": embedded_question_id,
         "answer": None,
         "answered": False,
         "created_at": datetime.now(timezone.utc),
         "answered_at": None,
         "teacher_id": course["teacher_id"],
+        "draft_status": "pending" if DRAFTS_ENABLED and query_emb is not None else None,
     }
 
     result = await db["queries"].insert_one(doc)
     doc["_id"] = result.inserted_id
+    await record_query_created(db, doc)
+    if moderation.get("degraded"):
+        await moderation_queue.enqueue(db, result.inserted_id, body.question, query_emb)
 
     # --- Notify Teacher ---
-    await db["notifications"].insert_one({
+    await notifications.notify(db, [{
         "user_id": course["teacher_id"],
         "message": f"A student raised a question on {course['name']}",
         "query_id": str(result.inserted_id),
         "course_id": body.course_id,
         "read": False,
         "created_at": datetime.now(timezone.utc),
-    })
+    }])
 
     return _query_doc(doc)
+
+
+async def _find_propagation_targets(db, q, exclude_ids=()):
+    """Pending queries in the same course that ask the same thing as `q`."""
+    if not ANSWER_PROPAGATION_ENABLED or q.get("embedding") is None:
+        return []
+    candidates = await search_pending_questions_vector(
+        db, q["embedding"], q["course_id"], limit=ANSWER_PROPAGATION_LIMIT + 1
+    )
+    excluded = set(exclude_ids)
+    return [
+        c for c in candidates
+        if c["_id"] != q["_id"]
+        and str(c["_id"]) not in excluded
+        and c.get("teacher_id") == q["teacher_id"]
+        and not c.get("moderation_flagged")
+        and c.get("similarityScore", 0) >= ANSWER_PROPAGATION_THRESHOLD
+    ]
+
+
+async def _apply_answers(db, teacher_id: str, answers, now, propagated=()):
+    """Persist (query, answer) pairs with one bulk write per collection.
+
+    `answers` are the teacher's own and may overwrite an earlier answer; `propagated`
+    pairs only land on queries that are still pending (the vector index lags writes).
+    Returns the propagated queries that were actually answered.
+    """
+    if not answers and not propagated:
+        return []
+
+    # --- Answer pending queries, tagged so we know exactly which writes landed ---
+    token = uuid.uuid4().hex
+    ids = [q["_id"] for q, _ in [*answers, *propagated]]
+    answer_update = lambda answer: {"$set": {"answer": answer, "answered": True, "answered_at": now, "answer_batch": token}}
+    writes = [UpdateOne({"_id": q["_id"], "answered": False}, answer_update(answer)) for q, answer in answers]
+    # the index may not know yet that a target got flagged by moderation either
+    writes += [
+        UpdateOne({"_id": q["_id"], "answered": False, "moderation_flagged": {"$ne": True}}, answer_update(answer))
+        for q, answer in propagated
+    ]
+    await db["queries"].bulk_write(writes, ordered=False)
+    newly_answered = {
+        d["_id"] for d in await db["queries"].find({"_id": {"$in": ids}, "answer_batch": token}, {"_id": 1}).to_list(None)
+    }
+
+    # --- Teacher edits of already answered queries ---
+    edits = [(q, answer) for q, answer in answers if q["_id"] not in newly_answered]
+    if edits:
+        await db["queries"].bulk_write([
+            UpdateOne({"_id": q["_id"]}, {"$set": {"answer": answer, "answered_at": now}})
+            for q, answer in edits
+        ], ordered=False)
+
+    written = [(q, a) for q, a in [*answers, *propagated] if q["_id"] in newly_answered] + edits
+    answered = [q for q, _ in written if q["_id"] in newly_answered]
+
+    # --- Notify Students ---
+    await notifications.notify(db, [
+        {
+            "user_id": q["student_id"],
+            "message": f"Your {q['course_name']} Query has been answered!",
+            "query_id": str(q["_id"]),
+            "course_id": q["course_id"],
+            "read": False,
+            "created_at": now,
+        }
+        for q, _ in written
+    ])
+
+    # --- Remove Teacher Notifications ---
+    await notifications.remove_for_queries(db, teacher_id, [str(q["_id"]) for q, _ in written])
+
+    # --- Guaranteed FAQ Update ---
+    faq_updates = [
+        UpdateOne(
+            {"_id": q["embedded_question_id"]},
+            {"$set": {"answer": answer, "updated_at": now}},
+        )
+        for q, answer in written
+        if q.get("embedded_question_id")
+    ]
+    if faq_updates:
+        await db["embedded_questions"].bulk_write(faq_updates, ordered=False)
+        for q, _ in written:
+            if q.get("embedded_question_id"):
+                typeahead.add_answered(q["course_id"], str(q["embedded_question_id"]), q["question"])
+
+    # counters and profiles only move for queries that went from pending to answered here
+    await record_queries_answered(db, answered, now)
+    await course_profiles.add_answered(db, answered)
+    return [q for q, _ in propagated if q["_id"] in newly_answered]
+
+
+# similar pending queries the answer would be propagated to
+@router.get("/{query_id}/similar-pending", response_model=list[SimilarPendingQueryResponse])
+async def similar_pending_queries(query_id: str, current_user=Depends(get_current_user)):
+    if current_user["role"] != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers")
+
+    db = get_database()
+
+    q = await db["queries"].find_one({"_id": ObjectId(query_id)})
+    if not q:
+        raise HTTPException(status_code=404, detail="Query not found")
+
+    if q["teacher_id"] != str(current_user["_id"]):
+        raise HTTPException(status_code=403, detail="This query is not assigned to you")
+
+    targets = await _find_propagation_targets(db, q)
+    return [
+        SimilarPendingQueryResponse(
+            **_query_doc(t, anonymous=True).model_dump(),
+            similarity=t.get("similarityScore", 0),
+        )
+        for t in targets
+    ]
+
+
 # teacher answer
-@router.patch("/{query_id}/answer", response_model=QueryResponse)
+@router.patch("/{query_id}/answer", response_model=QueryAnswerResponse)
 async def answer_query(query_id: str, body: QueryAnswer, current_user=Depends(get_current_user)):
     if current_user["role"] != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers can answer queries")
 
     db = get_database()
+    teacher_id = str(current_user["_id"])
 
     q = await db["queries"].find_one({"_id": ObjectId(query_id)})
     if not q:
         raise HTTPException(status_code=404, detail="Query not found")
 
-    if q["teacher_id"] != str(current_user["_id"]):
+    if q["teacher_id"] != teacher_id:
         raise HTTPException(status_code=403, detail="This query is not assigned to you")
 
+    # --- One-click confirm of the generated draft ---
+    answer = body.answer
+    if answer is None:
+        if q.get("draft_status") != "ready" or not q.get("draft_answer"):
+            raise HTTPException(status_code=400, detail="No answer given and no draft is ready for this query")
+        answer = q["draft_answer"]
+        metrics.incr("drafts.confirmed")
+
     now = datetime.now(timezone.utc)
 
-    # --- Update Query ---
-    await db["queries"].update_one(
-        {"_id": ObjectId(query_id)},
-        {"$set": {
-            "answer": body.answer,
-            "answered": True,
-            "answered_at": now
-        }},
+    # --- Answer Propagation to duplicate pending queries ---
+    targets = []
+    if body.propagate:
+        targets = await _find_propagation_targets(db, q, body.exclude_query_ids)
+
+    propagated = await _apply_answers(db, teacher_id, [(q, answer)], now, propagated=[(t, answer) for t in targets])
+
+    q.update({"answer": answer, "answered": True, "answered_at": now})
+    return QueryAnswerResponse(
+        **_query_doc(q, anonymous=True).model_dump(),
+        propagated_query_ids=[str(t["_id"]) for t in propagated],
     )
 
-    # --- Notify Student ---
-    await db["notifications"].insert_one({
-        "user_id": q["student_id"],
-        "message": f"Your {q['course_name']} Query has been answered!",
-        "query_id": query_id,
-        "course_id": q["course_id"],
-        "read": False,
-        "created_at": now,
-    })
+# bulk teacher answers
+@router.post("/answers/bulk", response_model=list[BulkAnswerItemResult])
+async def bulk_answer_queries(body: BulkAnswerRequest, current_user=Depends(get_current_user)):
+    if current_user["role"] != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can answer queries")
+    if len(body.items) > BULK_ANSWER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_ANSWER_MAX_ITEMS} answers per request")
 
-    # --- Remove Teacher Notification ---
-    await db["notifications"].delete_many({
-        "user_id": str(current_user["_id"]),
-        "query_id": query_id,
-    })
+    db = get_database()
+    teacher_id = str(current_user["_id"])
 
-    # --- Guaranteed FAQ Update ---
-    embedded_id = q.get("embedded_question_id")
-    if embedded_id:
-        await db["embedded_questions"].update_one(
-            {"_id": embedded_id},
-            {"$set": {
-                "answer": body.answer,
-                "updated_at": now
-            }}
-        )
+    results = {}
+    requested = {}
+    for item in body.items:
+        if item.query_id in results or item.query_id in requested:
+            results[item.query_id] = BulkAnswerItemResult(
+                query_id=item.query_id, status="duplicate", detail="Query listed more than once"
+            )
+            requested.pop(item.query_id, None)
+        elif not ObjectId.is_valid(item.query_id):
+            results[item.query_id] = BulkAnswerItemResult(
+                query_id=item.query_id, status="invalid", detail="Invalid query id"
+            )
+        else:
+            requested[item.query_id] = item.answer
+
+    # --- Validate ownership with a single lookup ---
+    found = {}
+    if requested:
+        docs = await db["queries"].find(
+            {"_id": {"$in": [ObjectId(qid) for qid in requested]}}
+        ).to_list(len(requested))
+        found = {str(q["_id"]): q for q in docs}
+
+    answers = []
+    for qid, answer in requested.items():
+        q = found.get(qid)
+        if not q:
+            results[qid] = BulkAnswerItemResult(query_id=qid, status="not_found", detail="Query not found")
+        elif q["teacher_id"] != teacher_id:
+            results[qid] = BulkAnswerItemResult(
+                query_id=qid, status="forbidden", detail="This query is not assigned to you"
+            )
+        else:
+            answers.append((q, answer))
+            results[qid] = BulkAnswerItemResult(query_id=qid, status="answered")
 
-    updated = await db["queries"].find_one({"_id": ObjectId(query_id)})
-    return _query_doc(updated, anonymous=True)
+    await _apply_answers(db, teacher_id, answers, datetime.now(timezone.utc))
+
+    return [results[item.query_id] for item in body.items]
 
 # queries for a course
 @router.get("/course/{course_id}", response_model=list[QueryResponse])
 async def queries_for_course(course_id: str, current_user=Depends(get_current_user)):
-    db = get_database()
+    db = get_secondary_database()
     student_id = str(current_user["_id"])
     queries = await db["queries"].find(
         {"course_id": course_id, "student_id": student_id}
@@ -252,7 +533,7 @@ async def queries_for_course(course_id: str, current_user=Depends(get_current_us
 # answered queries for a course
 @router.get("/course/{course_id}/answered", response_model=list[QueryResponse])
 async def answered_queries_for_course(course_id: str, current_user=Depends(get_current_user)):
-    db = get_database()
+    db = get_secondary_database()
     student_id = str(current_user["_id"])
     queries = await db["queries"].find(
         {"course_id": course_id, "student_id": student_id, "answered": True}
@@ -263,7 +544,7 @@ async def answered_queries_for_course(course_id: str, current_user=Depends(get_c
 # FAQ visibke to all students
 @router.get("/course/{course_id}/faq", response_model=list[EmbeddedQuestionResponse])
 async def faq_for_course(course_id: str, current_user=Depends(get_current_user)):
-    db = get_database()
+    db = get_secondary_database()
     faqs = await db["embedded_questions"].find(
         {"course_id": course_id, "answer": {"$ne": None}}
     ).sort("frequency", -1).to_list(50)
@@ -279,12 +560,56 @@ async def faq_for_course(course_id: str, current_user=Depends(get_current_user))
     ]
 
 
+# search answered FAQ and queries before asking
+@router.get("/course/{course_id}/search", response_model=list[FaqSearchResult])
+async def search_course_faq(
+    course_id: str,
+    q: str = Query(..., min_length=2, max_length=500),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50),
+    current_user=Depends(get_current_user),
+):
+    db = get_database()
+    if not await course_catalog.get(db, course_id):
+        raise HTTPException(status_code=404, detail="Course not found")
+    ranked = await hybrid_faq_search(db, course_id, q, limit=page * page_size)
+    return [
+        FaqSearchResult(
+            id=str(doc["_id"]),
+            source=doc["source"],
+            question=doc["question"],
+            answer=doc.get("answer"),
+            frequency=doc.get("frequency", 0),
+            score=round(score, 6),
+        )
+        for doc, score in ranked[(page - 1) * page_size:page * page_size]
+    ]
+
+
+# typeahead suggestions while the question is being typed
+@router.get("/course/{course_id}/suggest", response_model=list[FaqSuggestion])
+async def suggest_course_faq(
+    course_id: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(TYPEAHEAD_MAX_RESULTS, ge=1, le=TYPEAHEAD_MAX_RESULTS),
+    current_user=Depends(get_current_user),
+):
+    db = get_database()
+    if not await course_catalog.get(db, course_id):
+        raise HTTPException(status_code=404, detail="Course not found")
+    index = await typeahead.get_index(db, course_id)
+    return [
+        FaqSuggestion(id=s["id"], question=s["question"][:TYPEAHEAD_MAX_QUESTION_CHARS], frequency=s["frequency"])
+        for s in index.suggest(q, limit)
+    ]
+
+
 # FaQ of all subjects
 @router.get("/faq/all", response_model=list[EmbeddedQuestionResponse])
 async def all_faq(current_user=Depends(get_current_user)):
-    db = get_database()
+    db = get_secondary_database()
     faqs = await db["embedded_questions"].find(
-        {"answer": {"$ne": None}}
+        {"answer": {"$ne": None}, "course_id": {"$nin": list(course_catalog.tombstoned)}}
     ).sort("frequency", -1).to_list(200)
     return [
         EmbeddedQuestionResponse(
@@ -303,7 +628,7 @@ async def all_faq(current_user=Depends(get_current_user)):
 async def my_queries(current_user=Depends(get_current_user)):
     if current_user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can view their queries")
-    db = get_database()
+    db = get_secondary_database()
     student_id = str(current_user["_id"])
     queries = await db["queries"].find(
         {"student_id": student_id}
@@ -316,7 +641,7 @@ async def my_queries(current_user=Depends(get_current_user)):
 async def teacher_queries(current_user=Depends(get_current_user)):
     if current_user["role"] != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers")
-    db = get_database()
+    db = get_secondary_database()
     teacher_id = str(current_user["_id"])
     queries = await db["queries"].find(
         {"teacher_id": teacher_id}
@@ -332,9 +657,9 @@ async def teacher_pending_queries(current_user=Depends(get_current_user)):
     db = get_database()
     teacher_id = str(current_user["_id"])
     queries = await db["queries"].find(
-        {"teacher_id": teacher_id, "answered": False}
+        {"teacher_id": teacher_id, "answered": False, "moderation_flagged": {"$ne": True}}
     ).sort("created_at", -1).to_list(100)
-    return [_query_doc(q, anonymous=True) for q in queries]
+    return [_query_doc(q, anonymous=True, include_draft=True) for q in queries]
 
 
 # notifications
@@ -348,42 +673,88 @@ async def get_notifications(current_user=Depends(get_current_user)):
     return [_notif_doc(n) for n in notifs]
 
 
+# unread badge
+@router.get("/notifications/unread-count")
+async def get_unread_count(current_user=Depends(get_current_user)):
+    db = get_database()
+    return {"unread": await notifications.unread_count(db, str(current_user["_id"]))}
+
+
+# bulk mark as read: by ids, everything up to a cursor, or all
+@router.patch("/notifications/read")
+async def mark_notifications_read(body: NotificationReadRequest, current_user=Depends(get_current_user)):
+    if body.ids is not None:
+        if not all(ObjectId.is_valid(i) for i in body.ids):
+            raise HTTPException(status_code=400, detail="Invalid notification id")
+        extra_filter = {"_id": {"$in": [ObjectId(i) for i in body.ids]}}
+    elif body.up_to is not None:
+        if not ObjectId.is_valid(body.up_to):
+            raise HTTPException(status_code=400, detail="Invalid notification cursor")
+        extra_filter = {"_id": {"$lte": ObjectId(body.up_to)}}
+    else:
+        extra_filter = {}
+    db = get_database()
+    marked = await notifications.mark_read(db, str(current_user["_id"]), extra_filter)
+    return {"message": "Marked as read", "marked": marked}
+
+
 # mark as read
 @router.patch("/notifications/{notif_id}/read")
 async def mark_notification_read(notif_id: str, current_user=Depends(get_current_user)):
     db = get_database()
-    await db["notifications"].update_one(
-        {"_id": ObjectId(notif_id)},
-        {"$set": {"read": True}},
-    )
+    await notifications.mark_read(db, str(current_user["_id"]), {"_id": ObjectId(notif_id)})
     return {"message": "Marked as read"}
 
 
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
 # students who asked query
-@router.get("/teacher/course/{course_id}/students")
+@router.get("/teacher/course/{course_id}/students", response_model=list[CourseStudentSummary])
 async def teacher_course_students(course_id: str, current_user=Depends(get_current_user)):
     if current_user["role"] != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers")
     db = get_database()
     teacher_id = str(current_user["_id"])
-    queries = await db["queries"].find(
-        {"course_id": course_id, "teacher_id": teacher_id}
-    ).to_list(500)
-    students = {}
-    counter = 1
-    for q in queries:
-        sid = q["student_id"]
-        if sid not in students:
-            students[sid] = {
-                "student_id": sid,
-                "student_roll": f"Anonymous Student {counter}",
-                "student_name": "Anonymous",
-                "has_pending": False,
-            }
-            counter += 1
-        if not q.get("answered", False):
-            students[sid]["has_pending"] = True
-    return list(students.values())
+    roster_filter = {"course_id": course_id, "teacher_id": teacher_id}
+    await ensure_course_counters(db, [course_id])
+    counters = await db[STUDENT_COUNTERS].find(roster_filter).sort("first_activity", 1).to_list(None)
+    return [
+        CourseStudentSummary(
+            student_id=c["student_id"],
+            student_roll=f"Anonymous Student {i}",
+            has_pending=c.get("pending", 0) > 0,
+            total_queries=c.get("total", 0),
+            pending_queries=c.get("pending", 0),
+            last_activity=_iso(c.get("last_activity")),
+        )
+        for i, c in enumerate(counters, start=1)
+    ]
+
+
+# per-course summary for the teacher dashboard
+@router.get("/teacher/dashboard", response_model=list[TeacherCourseSummary])
+async def teacher_dashboard(current_user=Depends(get_current_user)):
+    if current_user["role"] != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers")
+    db = get_database()
+    teacher_id = str(current_user["_id"])
+    await ensure_course_counters(db, [str(c["_id"]) for c in course_catalog.for_teacher(teacher_id)])
+    counters = await db[COURSE_COUNTERS].find(
+        {"teacher_id": teacher_id}
+    ).sort("last_activity", -1).to_list(None)
+    return [
+        TeacherCourseSummary(
+            course_id=c["course_id"],
+            course_name=c.get("course_name", ""),
+            total_queries=c.get("total", 0),
+            pending_queries=c.get("pending", 0),
+            students=c.get("students", 0),
+            last_activity=_iso(c.get("last_activity")),
+        )
+        for c in counters
+    ]
 
 
 # all queries from specific student
@@ -391,7 +762,7 @@ async def teacher_course_students(course_id: str, current_user=Depends(get_curre
 async def teacher_student_queries(course_id: str, student_id: str, current_user=Depends(get_current_user)):
     if current_user["role"] != "teacher":
         raise HTTPException(status_code=403, detail="Only teachers")
-    db = get_database()
+    db = get_secondary_database()
     queries = await db["queries"].find(
         {"course_id": course_id, "student_id": student_id, "teacher_id": str(current_user["_id"])}
     ).sort("created_at", -1).to_list(100)
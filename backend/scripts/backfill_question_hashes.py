@@ -0,0 +1,44 @@
+"""Add `question_hash` to queries and FAQ entries created before the exact-match index.
+
+Run from the backend directory; pass --all to recompute every stored hash after
+the exact-match key changes (hashes from an older key simply never match):
+
+    python -m scripts.backfill_question_hashes
+    python -m scripts.backfill_question_hashes --all
+"""
+import argparse
+import asyncio
+from pymongo import UpdateOne
+
+from aimodels import question_hash
+from database import get_database, ensure_indexes
+
+BATCH_SIZE = 1000
+
+
+async def backfill(db, collection_name, rehash_all=False):
+    updated = 0
+    batch = []
+    filters = {} if rehash_all else {"question_hash": {"$exists": False}}
+    cursor = db[collection_name].find(filters, {"question": 1}).batch_size(BATCH_SIZE)
+    async for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"question_hash": question_hash(doc["question"])}}))
+        if len(batch) >= BATCH_SIZE:
+            updated += (await db[collection_name].bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db[collection_name].bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+
+async def main(rehash_all):
+    db = get_database()
+    await ensure_indexes()
+    for collection_name in ("embedded_questions", "queries"):
+        print(f"{collection_name}: {await backfill(db, collection_name, rehash_all)} documents hashed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--all", action="store_true", help="recompute existing hashes too")
+    asyncio.run(main(parser.parse_args().all))
@@ -0,0 +1,83 @@
+"""Compare answering N queries one by one against the bulk answer endpoint.
+
+Run from the backend directory against a scratch database (its name must end
+in "_bench"; the database is dropped afterwards):
+
+    MONGO_DB_NAME=Codeyatra_bench python -m scripts.bench_bulk_answer --count 200
+"""
+import os
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+BENCH_SUFFIX = "_bench"
+os.environ.setdefault("MONGO_DB_NAME", "Codeyatra" + BENCH_SUFFIX)
+
+from database import get_database
+from models import QueryAnswer, BulkAnswerItem, BulkAnswerRequest
+from routes.query_routes import answer_query, bulk_answer_queries
+
+
+async def seed(db, teacher, count):
+    course = {"name": "Benchmark Course", "teacher_id": str(teacher["_id"]), "teacher_name": teacher["name"]}
+    course["_id"] = (await db["courses"].insert_one(course)).inserted_id
+    now = datetime.now(timezone.utc)
+    docs = [
+        {
+            "course_id": str(course["_id"]),
+            "course_name": course["name"],
+            "student_id": f"bench-student-{i % 20}",
+            "student_name": "Bench Student",
+            "student_roll": "",
+            "question": f"Benchmark question {i}",
+            "embedding": None,
+            "embedded_question_id": None,
+            "answer": None,
+            "answered": False,
+            "created_at": now,
+            "answered_at": None,
+            "teacher_id": str(teacher["_id"]),
+        }
+        for i in range(count)
+    ]
+    result = await db["queries"].insert_many(docs)
+    return [str(_id) for _id in result.inserted_ids]
+
+
+async def main(count):
+    db = get_database()
+    # the run ends by dropping the whole database, so only ever touch a scratch one
+    if not db.name.endswith(BENCH_SUFFIX):
+        raise SystemExit(f"Refusing to benchmark against {db.name!r}; set MONGO_DB_NAME to a name ending in {BENCH_SUFFIX}")
+
+    teacher = {"name": "Bench Teacher", "email": "bench@example.com", "role": "teacher", "roll": ""}
+    teacher["_id"] = (await db["users"].insert_one(teacher)).inserted_id
+
+    try:
+        ids = await seed(db, teacher, count)
+        start = time.perf_counter()
+        for qid in ids:
+            await answer_query(qid, QueryAnswer(answer="Single answer", propagate=False), current_user=teacher)
+        single = time.perf_counter() - start
+
+        ids = await seed(db, teacher, count)
+        start = time.perf_counter()
+        await bulk_answer_queries(
+            BulkAnswerRequest(items=[BulkAnswerItem(query_id=qid, answer="Bulk answer") for qid in ids]),
+            current_user=teacher,
+        )
+        bulk = time.perf_counter() - start
+    finally:
+        await db.client.drop_database(db.name)
+
+    print(f"{count} single answers: {single * 1000:.1f} ms ({single * 1000 / count:.2f} ms/query)")
+    print(f"{count} bulk answers:   {bulk * 1000:.1f} ms ({bulk * 1000 / count:.2f} ms/query)")
+    print(f"speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.count))
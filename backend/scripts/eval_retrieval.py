@@ -0,0 +1,238 @@
+"""Evaluate duplicate-question retrieval quality and latency against a labelled pair set.
+
+Replays the pairs through the embedding model and a local stand-in for the
+Atlas vector index, then reports precision/recall for each similarity
+threshold, the deflection rate and search latency for each numCandidates
+value. The results are used to tune EMBEDDING_SIMILARITY_THRESHOLD and
+EMBEDDING_SEARCH_CANDIDATES. Run from the backend directory:
+
+    python -m scripts.eval_retrieval --pairs data/question_pairs.csv
+    python -m scripts.eval_retrieval --pairs pairs.jsonl --thresholds 0.75:0.95:0.01 --candidates 10,50,100,200 --json report.json
+
+The pairs file is either CSV with a header or JSON lines. It needs
+question1, question2 and is_duplicate columns, as in the Quora Question
+Pairs dataset. Every question2 becomes a stored (answered) question and
+every question1 is asked against them, top-1 as in create_query. Questions
+whose normalized text is already stored would be caught by the exact-match
+short circuit, so they are counted separately and left out of the vector
+evaluation.
+
+The stand-in index is an IVF index clustered with KMeans. For a given
+numCandidates it scans the nearest clusters until at least that many
+vectors have been gathered, which approximates how Atlas' HNSW search
+trades recall for latency. Scores use Atlas' cosine normalization,
+(1 + cos) / 2, so thresholds carry over as-is.
+"""
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from config import EMBEDDING_MODEL_NAME, EMBEDDING_SIMILARITY_THRESHOLD, EMBEDDING_SEARCH_CANDIDATES
+from aimodels import exact_key
+
+
+def load_pairs(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return [
+        (row["question1"], row["question2"], str(row["is_duplicate"]).strip().lower() in ("1", "true", "yes"))
+        for row in rows
+        if row.get("question1") and row.get("question2")
+    ]
+
+
+def build_eval_set(pairs):
+    """Deduplicated corpus (question2 side) and queries with the corpus ids they duplicate."""
+    corpus, corpus_ids = [], {}
+    queries, relevant = [], {}
+    for q1, q2, is_duplicate in pairs:
+        key = exact_key(q2)
+        if key not in corpus_ids:
+            corpus_ids[key] = len(corpus)
+            corpus.append(q2)
+        qkey = exact_key(q1)
+        if qkey not in relevant:
+            relevant[qkey] = set()
+            queries.append(q1)
+        if is_duplicate:
+            relevant[qkey].add(corpus_ids[key])
+    exact = [q for q in queries if exact_key(q) in corpus_ids]
+    vector_queries = [q for q in queries if exact_key(q) not in corpus_ids]
+    return corpus, vector_queries, [relevant[exact_key(q)] for q in vector_queries], len(exact)
+
+
+class IVFIndex:
+    """Inverted-file stand-in for the Atlas vector index over normalized embeddings."""
+
+    def __init__(self, vectors, n_lists):
+        self.vectors = vectors
+        n_lists = max(1, min(n_lists, len(vectors)))
+        kmeans = KMeans(n_clusters=n_lists, n_init=1, random_state=0).fit(vectors)
+        self.centroids = kmeans.cluster_centers_.astype(np.float32)
+        self.lists = [np.flatnonzero(kmeans.labels_ == i) for i in range(n_lists)]
+
+    def search(self, query, num_candidates, limit=1):
+        order = np.argsort(-(self.centroids @ query))
+        gathered, scanned = [], 0
+        for i in order:
+            gathered.append(self.lists[i])
+            scanned += len(self.lists[i])
+            if scanned >= num_candidates:
+                break
+        candidates = np.concatenate(gathered)
+        scores = (1 + self.vectors[candidates] @ query) / 2
+        top = np.argsort(-scores)[:limit]
+        return candidates[top], scores[top]
+
+    def exact(self, query, limit=1):
+        scores = (1 + self.vectors @ query) / 2
+        top = np.argsort(-scores)[:limit]
+        return top, scores[top]
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3) if samples else None
+
+
+def run_searches(index, query_vectors, num_candidates):
+    """Top-1 (id, score) per query plus per-query latency, for one numCandidates value."""
+    hits, latencies = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        if num_candidates is None:
+            ids, scores = index.exact(vector)
+        else:
+            ids, scores = index.search(vector, num_candidates)
+        latencies.append(time.perf_counter() - start)
+        hits.append((int(ids[0]), float(scores[0])))
+    return hits, latencies
+
+
+def score_threshold(hits, relevant, threshold):
+    tp = fp = 0
+    for (doc_id, score), rel in zip(hits, relevant):
+        if score < threshold:
+            continue
+        if doc_id in rel:
+            tp += 1
+        else:
+            fp += 1
+    positives = sum(1 for rel in relevant if rel)
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / positives if positives else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+    return {
+        "threshold": round(threshold, 4),
+        "precision": round(precision, 4) if precision is not None else None,
+        "recall": round(recall, 4) if recall is not None else None,
+        "f1": round(f1, 4) if f1 is not None else None,
+        # a match means the student gets an existing answer instead of a new query
+        "deflection_rate": round((tp + fp) / len(hits), 4) if hits else None,
+        "false_deflection_rate": round(fp / len(hits), 4) if hits else None,
+    }
+
+
+def parse_thresholds(spec):
+    if ":" in spec:
+        start, stop, step = map(float, spec.split(":"))
+        values = np.arange(start, stop + step / 2, step)
+    else:
+        values = spec.split(",")
+    # always include the configured threshold for comparison
+    return sorted({round(float(t), 4) for t in values} | {EMBEDDING_SIMILARITY_THRESHOLD})
+
+
+def main(args):
+    pairs = load_pairs(args.pairs)
+    corpus, queries, relevant, exact_hits = build_eval_set(pairs)
+    if not corpus or not queries:
+        raise SystemExit("Need at least one stored question and one query to evaluate")
+    print(f"{len(pairs)} pairs: {len(corpus)} stored questions, {len(queries)} queries "
+          f"({sum(1 for r in relevant if r)} with a duplicate), {exact_hits} exact-match hits skipped")
+
+    if args.model == EMBEDDING_MODEL_NAME:
+        from ai_clients import hf_client as model
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+
+    def encode(texts):
+        return model.encode(texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+
+    corpus_vectors = encode(corpus)
+    query_vectors = encode(queries)
+
+    # per-question latency as seen by create_query (one question per encode call)
+    sample = queries[:args.latency_sample]
+    embedding_latencies = []
+    for text in sample:
+        start = time.perf_counter()
+        encode([text])
+        embedding_latencies.append(time.perf_counter() - start)
+
+    n_lists = args.lists or max(1, int(np.sqrt(len(corpus))))
+    index = IVFIndex(corpus_vectors, n_lists)
+    exact_hits_top1, _ = run_searches(index, query_vectors, None)
+
+    thresholds = parse_thresholds(args.thresholds)
+    report = {
+        "pairs": len(pairs),
+        "stored_questions": len(corpus),
+        "queries": len(queries),
+        "exact_match_hits": exact_hits,
+        "ivf_lists": n_lists,
+        "embedding_latency_ms": {"p50": percentile_ms(embedding_latencies, 50), "p95": percentile_ms(embedding_latencies, 95)},
+        "configurations": [],
+    }
+    for num_candidates in [*args.candidates, None]:
+        hits, latencies = run_searches(index, query_vectors, num_candidates)
+        agreement = sum(h[0] == e[0] for h, e in zip(hits, exact_hits_top1)) / len(hits)
+        report["configurations"].append({
+            "num_candidates": num_candidates if num_candidates is not None else "exact",
+            "ann_recall_at_1": round(agreement, 4),
+            "search_latency_ms": {"p50": percentile_ms(latencies, 50), "p95": percentile_ms(latencies, 95)},
+            "curve": [score_threshold(hits, relevant, t) for t in thresholds],
+        })
+
+    print(f"embedding p50/p95: {report['embedding_latency_ms']['p50']} / {report['embedding_latency_ms']['p95']} ms")
+    print(f"{'candidates':>10} {'threshold':>9} {'precision':>9} {'recall':>7} {'f1':>7} {'deflect':>8} {'false':>7} {'p50 ms':>8} {'p95 ms':>8} {'ann@1':>6}")
+    for config in report["configurations"]:
+        for point in config["curve"]:
+            print(f"{config['num_candidates']:>10} {point['threshold']:>9} {str(point['precision']):>9} {str(point['recall']):>7} "
+                  f"{str(point['f1']):>7} {str(point['deflection_rate']):>8} {str(point['false_deflection_rate']):>7} "
+                  f"{config['search_latency_ms']['p50']:>8} {config['search_latency_ms']['p95']:>8} {config['ann_recall_at_1']:>6}")
+
+    # highest-recall threshold that keeps false matches rare enough, per candidate count
+    for config in report["configurations"]:
+        ok = [p for p in config["curve"] if p["precision"] is not None and p["precision"] >= args.min_precision]
+        best = max(ok, key=lambda p: (p["recall"] or 0, -p["threshold"]), default=None)
+        config["recommended_threshold"] = best["threshold"] if best else None
+        print(f"numCandidates={config['num_candidates']}: recommended threshold "
+              f"{best['threshold'] if best else 'none'} (precision >= {args.min_precision})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", required=True, help="CSV or JSONL with question1, question2, is_duplicate")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--thresholds", default="0.70:0.95:0.01",
+                        help="comma-separated list or start:stop:step")
+    parser.add_argument("--candidates", type=lambda s: [int(c) for c in s.split(",")],
+                        default=sorted({10, 25, 50, EMBEDDING_SEARCH_CANDIDATES, 200}))
+    parser.add_argument("--lists", type=int, default=None, help="IVF lists (default sqrt of the corpus size)")
+    parser.add_argument("--latency-sample", type=int, default=200)
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    parser.add_argument("--json", default=None, help="also write the full report here")
+    main(parser.parse_args())
@@ -0,0 +1,27 @@
+"""Rebuild the materialized query and unread-notification counters.
+
+Run from the backend directory once after deploying the counters, or any
+time they are suspected to have drifted:
+
+    python -m scripts.rebuild_counters
+"""
+import asyncio
+
+from database import get_database, ensure_indexes
+from counters import rebuild_course_counters
+from notifications import rebuild_unread_counters
+
+
+async def main():
+    db = get_database()
+    await ensure_indexes()
+    course_ids = await db["queries"].distinct("course_id")
+    for course_id in course_ids:
+        await rebuild_course_counters(db, course_id)
+    print(f"Rebuilt counters for {len(course_ids)} courses")
+    await rebuild_unread_counters(db)
+    print("Rebuilt unread notification counters")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
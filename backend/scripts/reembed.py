@@ -0,0 +1,152 @@
+"""Re-embed stored questions with a new embedding model, resumably.
+
+Documents are streamed in `_id` order, encoded in large batches across a
+process pool and written with bulk_write to the shadow fields
+`embedding_next`/`embedding_next_version`. The live `embedding` keeps serving
+search until the switch. Progress is checkpointed in the `migrations`
+collection, so an interrupted run picks up where it left off; rerunning after
+a finished pass sweeps again for stragglers. Run from the backend directory:
+
+1. Fill the shadow fields while the app keeps running on the old model:
+
+    python -m scripts.reembed --model sentence-transformers/all-MiniLM-L12-v2 --version all-MiniLM-L12-v2
+
+2. If the new model has a different dimension, create a second Atlas vector
+   index on `embedding` with the new numDimensions (same filter fields) and
+   set VECTOR_SEARCH_INDEX to its name in the next step.
+3. Point EMBEDDING_MODEL_NAME/VERSION at the new model and restart.
+4. Swap the shadow vectors in (one server-side update per collection):
+
+    python -m scripts.reembed --version all-MiniLM-L12-v2 --swap
+
+5. Repeat steps 1 and 4 once to pick up documents the old app wrote between
+   steps 1 and 3.
+
+Existing embeddings predating version tags can be tagged without re-encoding:
+
+    python -m scripts.reembed --version all-MiniLM-L6-v2 --tag-only
+"""
+import argparse
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+from config import EMBEDDING_MODEL_NAME
+from database import get_database
+
+COLLECTIONS = ("embedded_questions", "queries", "moderation_verdicts")
+_model = None
+
+
+def _init_worker(model_name):
+    global _model
+    from sentence_transformers import SentenceTransformer
+    _model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode(texts):
+    return _model.encode(texts, batch_size=64, convert_to_numpy=True).tolist()
+
+
+async def tag_existing(db, collection_name, version):
+    result = await db[collection_name].update_many(
+        {"embedding": {"$ne": None}, "embedding_version": {"$exists": False}},
+        {"$set": {"embedding_version": version}},
+    )
+    print(f"{collection_name}: tagged {result.modified_count} embeddings as {version}")
+
+
+async def swap(db, collection_name, version):
+    """Move the shadow vectors into `embedding` for documents migrated to `version`."""
+    result = await db[collection_name].update_many(
+        {"embedding_next_version": version},
+        [
+            {"$set": {"embedding": "$embedding_next", "embedding_version": "$embedding_next_version"}},
+            {"$unset": ["embedding_next", "embedding_next_version"]},
+        ],
+    )
+    print(f"{collection_name}: swapped {result.modified_count} embeddings to {version}")
+
+
+async def reembed(db, pool, workers, collection_name, version, batch_size):
+    checkpoint_id = f"reembed:{collection_name}:{version}"
+    checkpoint = await db["migrations"].find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("done"):
+        # a finished pass: start over so documents the app wrote with the old version
+        # since then are picked up (the version filter skips everything already migrated)
+        checkpoint = {}
+        await db["migrations"].update_one({"_id": checkpoint_id}, {"$set": {"done": False, "last_id": None, "processed": 0}})
+    last_id = checkpoint.get("last_id")
+    processed = checkpoint.get("processed", 0)
+    loop = asyncio.get_running_loop()
+
+    while True:
+        range_filter = {"_id": {"$gt": last_id}} if last_id else {}
+        docs = await db[collection_name].find(
+            {
+                **range_filter,
+                "question": {"$type": "string"},
+                "embedding_version": {"$ne": version},
+                "embedding_next_version": {"$ne": version},
+            },
+            {"question": 1},
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        # split the batch across the pool, one slice per worker
+        step = -(-len(docs) // workers)
+        slices = [docs[i:i + step] for i in range(0, len(docs), step)]
+        encoded = await asyncio.gather(*(
+            loop.run_in_executor(pool, _encode, [d["question"] for d in part]) for part in slices
+        ))
+        vectors = [v for part in encoded for v in part]
+
+        await db[collection_name].bulk_write([
+            UpdateOne({"_id": d["_id"]}, {"$set": {"embedding_next": v, "embedding_next_version": version}})
+            for d, v in zip(docs, vectors)
+        ], ordered=False)
+
+        last_id = docs[-1]["_id"]
+        processed += len(docs)
+        await db["migrations"].update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "processed": processed, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        print(f"{collection_name}: {processed} re-embedded")
+
+    await db["migrations"].update_one({"_id": checkpoint_id}, {"$set": {"done": True}}, upsert=True)
+    print(f"{collection_name}: done, {processed} shadow embeddings ready for {version}; swap them in after the switch")
+
+
+async def main(args):
+    db = get_database()
+    collections = COLLECTIONS if args.collection == "all" else (args.collection,)
+    if args.tag_only:
+        for collection_name in collections:
+            await tag_existing(db, collection_name, args.version)
+        return
+    if args.swap:
+        for collection_name in collections:
+            await swap(db, collection_name, args.version)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=_init_worker, initargs=(args.model,)) as pool:
+        for collection_name in collections:
+            await reembed(db, pool, args.workers, collection_name, args.version, args.batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--version", required=True)
+    parser.add_argument("--collection", choices=COLLECTIONS + ("all",), default="all")
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=max(multiprocessing.cpu_count() - 1, 1))
+    parser.add_argument("--tag-only", action="store_true")
+    parser.add_argument("--swap", action="store_true", help="after the switch: move the shadow vectors into place")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""Train (or refresh) the local moderation classifier from harvested LLM verdicts.
+
+Run from the backend directory; the new artifact is written as the next
+version in MODERATION_MODEL_DIR and picked up on the next startup:
+
+    python -m scripts.train_moderation --min-samples 200
+"""
+import os
+import json
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+from config import EMBEDDING_MODEL_VERSION, MODERATION_MODEL_DIR, MODERATION_LOCAL_SAFE_THRESHOLD, MODERATION_LOCAL_UNSAFE_THRESHOLD
+from database import get_database
+from moderation_model import VERDICTS_COLLECTION, artifact_versions, artifact_path, decide
+
+
+async def load_verdicts():
+    db = get_database()
+    cursor = db[VERDICTS_COLLECTION].find(
+        {"embedding_version": EMBEDDING_MODEL_VERSION},
+        {"embedding": 1, "label": 1, "blocked": 1},
+    ).batch_size(1000)
+    X, y = [], []
+    async for doc in cursor:
+        X.append(doc["embedding"])
+        # Non-SAFE labels the LLM wasn't confident about did not block, so they count as SAFE
+        y.append(doc["label"] if doc.get("blocked") else "SAFE")
+    return np.asarray(X, dtype=np.float32), np.asarray(y)
+
+
+def evaluate(classifier, X, y):
+    """Escalation rate and agreement with the LLM on held-out verdicts."""
+    decided = agreed = 0
+    for embedding, label in zip(X, y):
+        verdict = decide(classifier, embedding)
+        if verdict is None:
+            continue
+        decided += 1
+        agreed += verdict["blocked"] == (label != "SAFE")
+    return {
+        "held_out": len(y),
+        "escalation_rate": round(1 - decided / len(y), 4) if len(y) else None,
+        "agreement": round(agreed / decided, 4) if decided else None,
+        "safe_threshold": MODERATION_LOCAL_SAFE_THRESHOLD,
+        "unsafe_threshold": MODERATION_LOCAL_UNSAFE_THRESHOLD,
+    }
+
+
+async def main(min_samples, test_size):
+    X, y = await load_verdicts()
+    labels, counts = np.unique(y, return_counts=True)
+    if len(y) < min_samples:
+        raise SystemExit(f"Only {len(y)} verdicts harvested, need at least {min_samples}")
+    if "SAFE" not in labels or len(labels) < 2:
+        raise SystemExit(f"Need both SAFE and unsafe verdicts, got {dict(zip(labels, counts))}")
+
+    stratify = y if counts.min() >= 2 else None
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, stratify=stratify, random_state=0)
+    classifier = LogisticRegression(max_iter=1000, class_weight="balanced")
+    classifier.fit(X_train, y_train)
+
+    report = {
+        "samples": len(y),
+        "label_counts": {str(label): int(n) for label, n in zip(labels, counts)},
+        **evaluate(classifier, X_test, y_test),
+    }
+    versions = artifact_versions()
+    version = versions[-1] + 1 if versions else 1
+    os.makedirs(MODERATION_MODEL_DIR, exist_ok=True)
+    joblib.dump({
+        "version": version,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "embedding_version": EMBEDDING_MODEL_VERSION,
+        "classifier": classifier,
+        "report": report,
+    }, artifact_path(version))
+
+    print(f"Saved {artifact_path(version)}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-samples", type=int, default=200)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.min_samples, args.test_size))
@@ -0,0 +1,108 @@
+import time
+import heapq
+import asyncio
+from aimodels import normalize_question
+from config import TYPEAHEAD_MAX_ENTRIES_PER_COURSE, TYPEAHEAD_REFRESH_SECONDS
+
+# In-memory typeahead over answered FAQ entries, one index per course:
+# an inverted index for completed words and a trie for the word being typed.
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class CourseIndex:
+    def __init__(self):
+        self.entries = {}        # faq id -> {"question", "frequency", "tokens"}
+        self.inverted = {}       # token -> faq ids
+        self.trie = _TrieNode()  # every prefix node holds the ids of entries with a word starting there
+        self.loaded_at = time.monotonic()
+
+    def add(self, faq_id: str, question: str, frequency: int):
+        if faq_id in self.entries:
+            self.remove(faq_id)
+        tokens = set(normalize_question(question).split())
+        self.entries[faq_id] = {"question": question, "frequency": frequency, "tokens": tokens}
+        for token in tokens:
+            self.inverted.setdefault(token, set()).add(faq_id)
+            node = self.trie
+            for ch in token:
+                node = node.children.setdefault(ch, _TrieNode())
+                node.ids.add(faq_id)
+
+    def remove(self, faq_id: str):
+        entry = self.entries.pop(faq_id, None)
+        if entry is None:
+            return
+        for token in entry["tokens"]:
+            self.inverted.get(token, set()).discard(faq_id)
+            node = self.trie
+            for ch in token:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                node.ids.discard(faq_id)
+
+    def _prefix(self, prefix: str):
+        node = self.trie
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return set()
+        return node.ids
+
+    def suggest(self, text: str, limit: int):
+        tokens = normalize_question(text).split()
+        if not tokens:
+            return []
+        # the last word is still being typed unless the input ends with a space
+        complete, partial = (tokens, None) if text[-1:].isspace() else (tokens[:-1], tokens[-1])
+        postings = [self.inverted.get(t, set()) for t in complete]
+        if partial is not None:
+            postings.append(self._prefix(partial))
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        best = heapq.nlargest(limit, candidates, key=lambda i: self.entries[i]["frequency"])
+        return [{"id": i, **{k: self.entries[i][k] for k in ("question", "frequency")}} for i in best]
+
+
+_indexes = {}
+_locks = {}
+
+
+async def get_index(db, course_id: str) -> CourseIndex:
+    index = _indexes.get(course_id)
+    if index is not None and time.monotonic() - index.loaded_at < TYPEAHEAD_REFRESH_SECONDS:
+        return index
+    lock = _locks.setdefault(course_id, asyncio.Lock())
+    async with lock:
+        index = _indexes.get(course_id)
+        if index is None or time.monotonic() - index.loaded_at >= TYPEAHEAD_REFRESH_SECONDS:
+            index = CourseIndex()
+            cursor = db["embedded_questions"].find(
+                {"course_id": course_id, "answer": {"$ne": None}},
+                {"question": 1, "frequency": 1},
+            ).sort("frequency", -1).limit(TYPEAHEAD_MAX_ENTRIES_PER_COURSE)
+            async for faq in cursor:
+                index.add(str(faq["_id"]), faq["question"], faq.get("frequency", 0))
+            _indexes[course_id] = index
+    return index
+
+
+def add_answered(course_id: str, faq_id: str, question: str, frequency: int = 1):
+    """Index an FAQ entry that just got an answer (only if the course index is loaded)."""
+    index = _indexes.get(course_id)
+    if index is not None:
+        existing = index.entries.get(faq_id)
+        index.add(faq_id, question, existing["frequency"] if existing else frequency)
+
+
+def set_frequency(course_id: str, faq_id: str, frequency: int):
+    index = _indexes.get(course_id)
+    if index is not None and faq_id in index.entries:
+        index.entries[faq_id]["frequency"] = frequency